@@ -0,0 +1 @@
+"""Performance benchmarks of pyaxis (not shipped with the package)."""
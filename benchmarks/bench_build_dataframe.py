@@ -0,0 +1,63 @@
+"""Benchmark: dimension columns of build_dataframe().
+
+Compares the former list(itertools.product(...)) construction with the
+vectorized integer-code construction on px-x-0602000000_107.px, scaled up
+by repeating the members of its first dimension.
+
+Usage:
+    python -m benchmarks.bench_build_dataframe [scale ...]
+"""
+
+import itertools
+import sys
+import time
+
+from pandas import DataFrame
+from pkg_resources import resource_filename
+
+from pyaxis import pyaxis
+from pyaxis.data_processing import dimension_columns
+
+
+def itertools_columns(dimension_names, dimension_members):
+    """Previous implementation of the dimension columns."""
+    dim_exploded = list(itertools.product(*dimension_members))
+    return DataFrame(data=dim_exploded, columns=dimension_names)
+
+
+def scaled_dimensions(metadata, scale):
+    """Dimensions of the file with the first one repeated scale times."""
+    dimension_names, dimension_members = pyaxis.get_dimensions(metadata)
+    dimension_members[0] = [member + ' #' + str(i)
+                            for i in range(scale)
+                            for member in dimension_members[0]]
+    return dimension_names, dimension_members
+
+
+def timed(function, *args):
+    """Run function once and return the elapsed seconds and its result."""
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main(scales):
+    """Print timings of both constructions for each scale."""
+    path = resource_filename('pyaxis', 'test/data/px-x-0602000000_107.px')
+    pc_axis = pyaxis.read(path, 'ISO-8859-2')
+    metadata_elements, _ = pyaxis.metadata_extract(pc_axis)
+    metadata = pyaxis.metadata_split_to_dict(metadata_elements)
+
+    print('{:>12} {:>12} {:>12} {:>8}'.format(
+        'cells', 'itertools s', 'vectorized s', 'speedup'))
+    for scale in scales:
+        names, members = scaled_dimensions(metadata, scale)
+        old_time, old_df = timed(itertools_columns, names, members)
+        new_time, new_df = timed(dimension_columns, names, members)
+        assert old_df.equals(new_df)
+        print('{:>12} {:>12.3f} {:>12.3f} {:>7.1f}x'.format(
+            len(new_df), old_time, new_time, old_time / new_time))
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1, 10, 100])
@@ -0,0 +1,60 @@
+"""Benchmark: cold-start time of importing pyaxis.
+
+Each measurement runs in a fresh interpreter. The import of pyaxis.pyaxis
+and pyaxis.json_stat alone is compared with the same import preceded by
+pandas, requests and pyjstat, which is what importing pyaxis cost when
+those were imported eagerly. The heavy modules left loaded by the bare
+import are listed too.
+
+Usage:
+    python -m benchmarks.bench_import [runs]
+"""
+
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ('pandas', 'requests', 'pyjstat')
+
+PYAXIS_IMPORT = 'import pyaxis.pyaxis, pyaxis.json_stat'
+EAGER_IMPORT = 'import pandas, requests, pyjstat.pyjstat; ' + PYAXIS_IMPORT
+
+TIMED = '''
+import sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+loaded = [name for name in {heavy!r} if name in sys.modules]
+print(elapsed, ','.join(loaded))
+'''
+
+
+def run(statement):
+    """Time a statement in a fresh interpreter.
+
+    Returns:
+        elapsed (float): seconds
+        loaded (list of string): heavy modules imported by the statement
+
+    """
+    output = subprocess.run(
+        [sys.executable, '-c', TIMED.format(statement=statement, heavy=HEAVY_MODULES)],
+        check=True, capture_output=True, text=True).stdout.split()
+    return float(output[0]), output[1].split(',') if len(output) > 1 else []
+
+
+def main(runs):
+    """Print the median import time of both variants."""
+    lazy = [run(PYAXIS_IMPORT) for _ in range(runs)]
+    eager = [run(EAGER_IMPORT) for _ in range(runs)]
+    lazy_time = statistics.median(elapsed for elapsed, _ in lazy)
+    eager_time = statistics.median(elapsed for elapsed, _ in eager)
+    print('{:>24} {:>10}'.format('', 'median s'))
+    print('{:>24} {:>10.3f}'.format('pyaxis', lazy_time))
+    print('{:>24} {:>10.3f}'.format('pyaxis + eager imports', eager_time))
+    print('speedup {:.1f}x; heavy modules loaded by pyaxis: {}'.format(
+        eager_time / lazy_time, ', '.join(lazy[0][1]) or 'none'))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,48 @@
+"""Benchmark: multilingual_parse() on large synthetic multilingual files.
+
+Each file has the given number of one-member dimensions, so that the
+metadata holds VALUES and CODES keywords for all of them in four
+languages. Time per key should stay flat as the number of keys grows.
+
+Usage:
+    python -m benchmarks.bench_multilingual [dimensions ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import generate_px
+from pyaxis.metadata_processing import metadata_extract, metadata_split_to_dict, \
+    multilingual_parse
+from pyaxis.pyaxis import read
+
+LANGUAGES = ('de', 'fr', 'it', 'en')
+
+
+def metadata_of(dimensions):
+    """Metadata dictionary of a synthetic file with that many dimensions."""
+    handle, path = tempfile.mkstemp(suffix='.px')
+    os.close(handle)
+    try:
+        generate_px(path, [1] * dimensions, languages=LANGUAGES)
+        return metadata_split_to_dict(metadata_extract(read(path, 'utf-8'))[0])
+    finally:
+        os.remove(path)
+
+
+def main(dimension_counts):
+    """Print the time of multilingual_parse() for each file size."""
+    print('{:>10} {:>10} {:>12} {:>12}'.format('dimensions', 'keys', 'seconds', 'us per key'))
+    for dimensions in dimension_counts:
+        metadata = metadata_of(dimensions)
+        start = time.perf_counter()
+        multilingual_parse(metadata, 'fr')
+        elapsed = time.perf_counter() - start
+        print('{:>10} {:>10} {:>12.4f} {:>12.2f}'.format(
+            dimensions, len(metadata), elapsed, elapsed / len(metadata) * 1e6))
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [250, 1000, 4000])
@@ -0,0 +1,142 @@
+"""Benchmark: time and memory of each stage of parse() and JSON-Stat export.
+
+Synthetic PX files are generated for every combination of cube shape
+(dimensionality and member counts), languages and null density, and every
+stage of the pipeline is run on the output of the previous one: read,
+metadata_extract, metadata_split_to_dict, multilingual_parse,
+build_dataframe, to_json_stat and json_stat_dict. Only the stage itself is
+timed. Its peak memory, measured in one more run with tracemalloc, which
+slows code down, is stored with the timings as extra_info['peak_bytes'].
+
+Requires pytest-benchmark. Results are saved as JSON and compared between
+runs with its options, e.g.:
+
+Usage:
+    python -m pytest benchmarks/bench_pipeline.py --benchmark-json=before.json
+    python -m pytest benchmarks/bench_pipeline.py --benchmark-autosave \\
+        --benchmark-compare --benchmark-compare-fail=median:10%
+"""
+
+import copy
+import tracemalloc
+
+import pytest
+
+from benchmarks.synthetic import generate_px
+from pyaxis import json_stat
+from pyaxis.data_processing import build_dataframe, get_dimensions
+from pyaxis.metadata_processing import metadata_extract, metadata_split_to_dict, \
+    multilingual_parse
+from pyaxis.pyaxis import read
+
+pytest.importorskip('pytest_benchmark')
+
+# members of each dimension, STUB first; the last one is the HEADING
+CUBES = {
+    '2d-200x100': (200, 100),
+    '4d-20x30x12x10': (20, 30, 12, 10),
+    '6d-8x8x8x8x6x5': (8, 8, 8, 8, 6, 5),
+}
+LANGUAGES = {
+    '1-language': ('en',),
+    '4-languages': ('en', 'de', 'fr', 'it'),
+}
+NULL_DENSITIES = (0.0, 0.3)
+# share of statistical disclosure cells, as a fraction of the null ones
+SD_SHARE = 0.5
+# timed runs of each stage
+ROUNDS = 3
+
+
+def stages(path, lang):
+    """Stages of the pipeline as (name, function of the previous results).
+
+       A stage that changes its input gets a copy, made before it is timed.
+    """
+    def parsed(results):
+        return {'METADATA': copy.deepcopy(results['multilingual_parse'][0]),
+                'DATA': results['build_dataframe'],
+                'TRANSLATION': results['multilingual_parse'][1]}
+
+    return [
+        ('read', lambda results: ((path, 'utf-8'), read)),
+        ('metadata_extract', lambda results: ((results['read'],), metadata_extract)),
+        ('metadata_split_to_dict',
+         lambda results: ((results['metadata_extract'][0],), metadata_split_to_dict)),
+        ('multilingual_parse',
+         lambda results: ((copy.deepcopy(results['metadata_split_to_dict']), lang),
+                          multilingual_parse)),
+        ('build_dataframe', lambda results: (
+            (*get_dimensions(results['multilingual_parse'][0]),
+             data_values(results['metadata_extract'][1]), r'^"\."$', r'"\.\."'),
+            build_dataframe)),
+        ('to_json_stat', lambda results: ((parsed(results),), json_stat.to_json_stat)),
+        ('json_stat_dict',
+         lambda results: ((parsed(results),), json_stat.json_stat_dict)),
+    ]
+
+
+STAGE_NAMES = [name for name, _ in stages(None, None)]
+
+
+def data_values(data):
+    """DATA section as the Series of tokens build_dataframe() takes."""
+    from pandas import Series  # pylint: disable=import-outside-toplevel
+    return Series(data.split())
+
+
+def run_until(path, lang, stage_name):
+    """Run the stages before stage_name and return the inputs of that stage.
+
+    Returns:
+        prepare (function): returns fresh (args, function) of the stage
+
+    """
+    results = {}
+    for name, prepare in stages(path, lang):
+        if name == stage_name:
+            return lambda: prepare(results)
+        args, function = prepare(results)
+        results[name] = function(*args)
+    raise ValueError('unknown stage ' + stage_name)
+
+
+def peak_bytes(function, args):
+    """Peak memory allocated by one call, measured with tracemalloc."""
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        function(*args)
+        return tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.fixture(scope='module', params=[
+    (cube, languages, null_density)
+    for cube in CUBES for languages in LANGUAGES for null_density in NULL_DENSITIES],
+    ids=lambda param: '{}-{}-null{}'.format(*param))
+def px_file(request, tmp_path_factory):
+    """Synthetic PX file of each combination of shape, languages and nulls."""
+    cube, languages, null_density = request.param
+    path = str(tmp_path_factory.mktemp('px') / 'synthetic.px')
+    cells = generate_px(path, CUBES[cube], 1, LANGUAGES[languages],
+                        null_density, null_density * SD_SHARE)
+    return {'path': path, 'cube': cube, 'dimensions': len(CUBES[cube]),
+            'cells': cells, 'languages': len(LANGUAGES[languages]),
+            'null_density': null_density,
+            # the last language is parsed, so translation is exercised
+            'lang': LANGUAGES[languages][-1]}
+
+
+@pytest.mark.parametrize('stage_name', STAGE_NAMES)
+def test_stage(benchmark, px_file, stage_name):
+    """Time one stage of the pipeline and record its peak memory."""
+    prepare = run_until(px_file['path'], px_file['lang'], stage_name)
+    benchmark.group = stage_name
+    benchmark.extra_info.update(
+        {key: value for key, value in px_file.items() if key not in ('path', 'lang')})
+    args, function = prepare()
+    benchmark.extra_info['peak_bytes'] = peak_bytes(function, args)
+    benchmark.pedantic(lambda stage_args, stage_function: stage_function(*stage_args),
+                       setup=lambda: (prepare(), {}), rounds=ROUNDS)
@@ -0,0 +1,132 @@
+"""Synthetic PX files of configurable size for the benchmarks.
+
+generate_px() writes a cube with the given member count per dimension,
+optionally with every keyword translated into extra languages, and with a
+share of null (".") and statistical disclosure ("..") cells.
+
+Usage:
+    python -m benchmarks.synthetic out.px [size ...]
+"""
+
+import sys
+
+from numpy.random import default_rng
+
+# cells formatted and written at a time
+WRITE_BLOCK_SIZE = 1 << 16
+
+
+def quoted(values):
+    """Quote and join PX values."""
+    return ','.join('"' + value + '"' for value in values)
+
+
+def keyword_lines(keyword, values, languages, subkey=None):
+    """Lines of a keyword in the default language followed by its translations.
+
+    Args:
+        keyword (str): PX keyword
+        values (function): language -> list of string
+        languages (list of string): default language first
+        subkey (function): language -> subkey, for keywords like VALUES; optional
+
+    Returns:
+        lines (list of string)
+
+    """
+    lines = []
+    for position, language in enumerate(languages):
+        name = keyword if position == 0 else keyword + '[' + language + ']'
+        if subkey is not None:
+            name += '("' + subkey(language) + '")'
+        lines.append(name + '=' + quoted(values(language)) + ';')
+    return lines
+
+
+def generate_px(path, sizes=(20, 30, 12, 10), heading=1, languages=('en',),
+                null_density=0.0, sd_density=0.0, decimals=1, seed=0):
+    """Write a synthetic PX file.
+
+    Args:
+        path (str): output file name
+        sizes (list of int): number of members of each dimension, STUB first
+        heading (int): number of trailing dimensions in HEADING
+        languages (list of string): languages of the metadata, default first
+        null_density (float): share of null cells
+        sd_density (float): share of statistical disclosure cells
+        decimals (int): DECIMALS of the cube
+        seed (int): random seed
+
+    Returns:
+        cells (int): number of cells written
+
+    """
+    languages = list(languages)
+    names = ['dimension ' + str(position) for position in range(len(sizes))]
+
+    def name(dimension, language):
+        return names[dimension] + ' ' + language
+
+    def members(dimension, language):
+        return ['member ' + str(member) + ' of ' + name(dimension, language)
+                for member in range(sizes[dimension])]
+
+    stub = range(len(sizes) - heading)
+    heading_dimensions = range(len(sizes) - heading, len(sizes))
+    lines = ['CHARSET="ANSI";', 'AXIS-VERSION="2010";',
+             'LANGUAGE="' + languages[0] + '";']
+    if len(languages) > 1:
+        lines.append('LANGUAGES=' + quoted(languages) + ';')
+    lines += ['CREATION-DATE="20240101 09:00";', 'DECIMALS=' + str(decimals) + ';',
+              'MATRIX="synthetic";', 'SUBJECT-CODE="00";']
+    for keyword in ('SUBJECT-AREA', 'TITLE', 'CONTENTS', 'UNITS'):
+        lines += keyword_lines(
+            keyword, lambda language, keyword=keyword: [keyword.lower() + ' ' + language],
+            languages)
+    lines += keyword_lines(
+        'STUB', lambda language: [name(dimension, language) for dimension in stub],
+        languages)
+    lines += keyword_lines(
+        'HEADING',
+        lambda language: [name(dimension, language) for dimension in heading_dimensions],
+        languages)
+    for dimension in range(len(sizes)):
+        lines += keyword_lines(
+            'VALUES', lambda language, dimension=dimension: members(dimension, language),
+            languages, lambda language, dimension=dimension: name(dimension, language))
+    for dimension in range(len(sizes)):
+        lines += keyword_lines(
+            'CODES',
+            lambda language, dimension=dimension: [str(member)
+                                                   for member in range(sizes[dimension])],
+            languages, lambda language, dimension=dimension: name(dimension, language))
+    lines += keyword_lines('SOURCE', lambda language: ['pyaxis benchmarks'], languages)
+    lines += keyword_lines('NOTE', lambda language: ['synthetic cube ' + language],
+                           languages)
+
+    cells = 1
+    for size in sizes:
+        cells *= size
+    row_length = 1
+    for dimension in heading_dimensions:
+        row_length *= sizes[dimension]
+    rng = default_rng(seed)
+    with open(path, 'w', encoding='utf-8') as file_object:
+        file_object.write('\n'.join(lines) + '\nDATA=\n')
+        for start in range(0, cells, WRITE_BLOCK_SIZE):
+            count = min(WRITE_BLOCK_SIZE, cells - start)
+            draws = rng.random(count)
+            values = rng.random(count) * 10000
+            tokens = ['".."' if draw < sd_density else
+                      '"."' if draw < sd_density + null_density else
+                      '%.*f' % (decimals, value)
+                      for draw, value in zip(draws.tolist(), values.tolist())]
+            file_object.write(''.join(
+                token + ('\n' if (start + position + 1) % row_length == 0 else ' ')
+                for position, token in enumerate(tokens)))
+        file_object.write(';\n')
+    return cells
+
+
+if __name__ == '__main__':
+    print(generate_px(sys.argv[1], [int(arg) for arg in sys.argv[2:]] or (20, 30, 12, 10)))
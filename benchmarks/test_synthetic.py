@@ -0,0 +1,32 @@
+"""Unit tests for the synthetic PX generator of the benchmarks."""
+
+import pytest
+
+from benchmarks.synthetic import generate_px
+from pyaxis import pyaxis
+
+
+@pytest.mark.parametrize('sizes, heading, languages, null_density, sd_density', [
+    ((20, 30, 12, 10), 1, ('en',), 0.0, 0.0),
+    ((200, 100), 1, ('en', 'de', 'fr', 'it'), 0.2, 0.1),
+    ((8, 8, 8, 6, 5), 2, ('es', 'en'), 0.3, 0.15),
+])
+def test_generate_px(tmp_path, sizes, heading, languages, null_density, sd_density):
+    """generate_px() output should parse with the requested shape and shares."""
+    path = str(tmp_path / 'synthetic.px')
+    cells = generate_px(path, sizes, heading, languages, null_density, sd_density)
+    parsed_pcaxis = pyaxis.parse(path, encoding='utf-8', numeric=True,
+                                 lang=languages[-1])
+    metadata = parsed_pcaxis['METADATA']
+    names = metadata['STUB'] + metadata['HEADING']
+
+    assert len(metadata['STUB']) == len(sizes) - heading
+    assert len(metadata['HEADING']) == heading
+    assert all(name.endswith(' ' + languages[-1]) for name in names)
+    assert [len(metadata['VALUES(' + name + ')']) for name in names] == list(sizes)
+    assert parsed_pcaxis['DATA'].shape == (cells, len(sizes) + 1)
+    assert metadata.get('LANGUAGES', [languages[0]]) == list(languages)
+    assert parsed_pcaxis['FLAGS']['NULL'].mean() == pytest.approx(null_density, abs=0.01)
+    assert parsed_pcaxis['FLAGS']['SD'].mean() == pytest.approx(sd_density, abs=0.01)
+    assert parsed_pcaxis['DATA']['DATA'].notna().mean() == pytest.approx(
+        1 - null_density - sd_density, abs=0.01)
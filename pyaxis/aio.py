@@ -0,0 +1,295 @@
+"""Aio: asyncio API to download and parse PX files.
+
+aread() and aparse() are the coroutine counterparts of pyaxis.read() and
+pyaxis.parse(), for use inside async web services. Bodies are downloaded in
+chunks by a transport without blocking the event loop, and the CPU-bound
+stages (metadata extraction, building the dataframe) run in an executor.
+
+A transport is an async generator function called as
+transport(uri, timeout, verify, headers, chunk_size) that yields the body of
+the URL as chunks of bytes. aiohttp_transport() is used when aiohttp is
+installed (pip install pyaxis[aio]), with one ClientSession shared by every
+download of an event loop, which aclose() closes; otherwise
+requests_transport() runs blocking requests in the default executor, one
+chunk at a time, each executor thread with a session of its own (see
+pyaxis.get_session()).
+
+aparse() hands the chunks to the parser as they arrive, so tokenizing
+overlaps the download, unless it runs in a process pool, which gets the
+whole body once downloaded.
+
+Example:
+    from pyaxis import aio
+
+    px = await aio.aparse('https://example.org/census.px', encoding='ISO-8859-15')
+    await aio.aclose()
+"""
+
+import asyncio
+import codecs
+import concurrent.futures
+import functools
+import importlib.util
+import queue
+import ssl
+import weakref
+
+from pyaxis.pyaxis import CHUNK_SIZE, _request, parse_contents, uri_type
+
+
+async def requests_transport(uri, timeout, verify, headers, chunk_size):
+    """Download a URL with requests, off the event loop.
+
+       The request is sent with the keep-alive session of the executor
+       thread that runs it, never with one shared between threads.
+
+    Args:
+        uri (str): URL
+        timeout (int): request timeout
+        verify (bool, str): verify server TLS certificate or not, or path to cert file
+        headers (dict): HTTP headers
+        chunk_size (int): number of bytes per chunk
+
+    Yields:
+        chunk (bytes): next piece of the response body.
+
+    """
+    loop = asyncio.get_running_loop()
+    response = await loop.run_in_executor(
+        None, _request, uri, timeout, verify, headers)
+    try:
+        byte_chunks = response.iter_content(chunk_size)
+        while True:
+            chunk = await loop.run_in_executor(None, next, byte_chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        response.close()
+
+
+async def aiohttp_transport(uri, timeout, verify, headers, chunk_size, session=None):
+    """Download a URL with aiohttp.
+
+       As with requests, timeout bounds connecting and each wait for data,
+       not the whole download, so large files are not cut off.
+
+    Args:
+        uri (str): URL
+        timeout (int): connect and read timeout
+        verify (bool, str): verify server TLS certificate or not, or path to cert file
+        headers (dict): HTTP headers
+        chunk_size (int): number of bytes per chunk
+        session (aiohttp.ClientSession): defaults to the one shared by the
+                                         running event loop (see aclose()).
+                                         Optional
+
+    Yields:
+        chunk (bytes): next piece of the response body.
+
+    """
+    import aiohttp  # pylint: disable=import-outside-toplevel
+
+    if isinstance(verify, str):
+        ssl_context = ssl.create_default_context(cafile=verify)
+    else:
+        ssl_context = None if verify else False
+    session = session or aiohttp_session()
+    async with session.get(
+            uri, headers=headers, ssl=ssl_context,
+            timeout=aiohttp.ClientTimeout(
+                sock_connect=timeout, sock_read=timeout)) as response:
+        response.raise_for_status()
+        async for chunk in response.content.iter_chunked(chunk_size):
+            yield chunk
+
+
+# aiohttp.ClientSession of each event loop, created on first use
+_AIOHTTP_SESSIONS = weakref.WeakKeyDictionary()
+
+
+def aiohttp_session():
+    """Return the aiohttp.ClientSession of the running event loop.
+
+       Sharing it keeps connections alive between downloads. It is bound
+       to its event loop, so every loop gets its own.
+
+    Returns:
+        session (aiohttp.ClientSession)
+
+    """
+    import aiohttp  # pylint: disable=import-outside-toplevel
+
+    loop = asyncio.get_running_loop()
+    session = _AIOHTTP_SESSIONS.get(loop)
+    if session is None or session.closed:
+        session = _AIOHTTP_SESSIONS[loop] = aiohttp.ClientSession()
+    return session
+
+
+async def aclose():
+    """Close the aiohttp session of the running event loop, if any."""
+    session = _AIOHTTP_SESSIONS.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
+
+
+async def file_transport(uri, chunk_size):
+    """Read a local file in chunks of bytes, off the event loop."""
+    loop = asyncio.get_running_loop()
+    file_object = await loop.run_in_executor(None, open, uri, 'rb')
+    try:
+        while True:
+            chunk = await loop.run_in_executor(None, file_object.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        file_object.close()
+
+
+def default_transport():
+    """Return aiohttp_transport if aiohttp is installed, else requests_transport."""
+    if importlib.util.find_spec('aiohttp') is not None:
+        return aiohttp_transport
+    return requests_transport
+
+
+async def aread_chunks(uri, encoding, timeout=10, verify=True, headers=None,
+                       chunk_size=CHUNK_SIZE, transport=None):
+    """Read a text file from file system or URL in chunks, asynchronously.
+
+    Args:
+        uri (str): file name or URL
+        encoding (str): charset encoding
+        timeout (int): request timeout; optional
+        verify (bool, str): verify server TLS certificate or not, or path to cert file; optional
+        headers (dict): HTTP headers; optional
+        chunk_size (int): number of bytes per chunk; optional
+        transport: async generator function that downloads URLs; defaults to
+                   default_transport(). Optional
+
+    Yields:
+        chunk (str): next piece of the file contents.
+
+    """
+    if uri_type(uri) == 'URL':
+        transport = transport or default_transport()
+        byte_chunks = transport(uri, timeout, verify, headers, chunk_size)
+    else:
+        byte_chunks = file_transport(uri, chunk_size)
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    async for byte_chunk in byte_chunks:
+        chunk = decoder.decode(byte_chunk)
+        if chunk:
+            yield chunk
+    chunk = decoder.decode(b'', final=True)
+    if chunk:
+        yield chunk
+
+
+async def aread(uri, encoding, timeout=10, verify=True, headers=None,
+                chunk_size=CHUNK_SIZE, transport=None):
+    """Read a text file from file system or URL, asynchronously.
+
+    Args:
+        uri (str): file name or URL
+        encoding (str): charset encoding
+        timeout (int): request timeout; optional
+        verify (bool, str): verify server TLS certificate or not, or path to cert file; optional
+        headers (dict): HTTP headers; optional
+        chunk_size (int): number of bytes per chunk; optional
+        transport: async generator function that downloads URLs; optional
+
+    Returns:
+        raw_pcaxis (str): file contents.
+
+    """
+    chunks = [chunk async for chunk in aread_chunks(
+        uri, encoding, timeout, verify, headers, chunk_size, transport)]
+    return ''.join(chunks)
+
+
+async def aparse(uri, encoding, timeout=10, verify=True,
+                 null_values=r'^"\."$', sd_values=r'"\.\."',
+                 lang=None, headers=None, chunk_size=CHUNK_SIZE,
+                 categorical=False, numeric=False, select=None,
+                 transport=None, executor=None, dimensions='labels'):
+    """Extract metadata and data sections from pc-axis, asynchronously.
+
+    Args:
+        uri (str): file name or URL
+        encoding (str): charset encoding
+        timeout (int): request timeout in seconds; optional
+        verify (bool, str): verify server TLS certificate or not, or path to cert file; optional
+        null_values(str): regex with the pattern for the null values in the px
+                          file. Defaults to '.'.
+        sd_values(str): regex with the pattern for the statistical disclosured
+                        values in the px file. Defaults to '..'.
+        lang: language desired for the metadata and the column names of the dataframe
+        headers (dict): HTTP headers; optional
+        chunk_size (int): number of bytes per downloaded chunk; optional
+        categorical (bool): as in parse(); optional
+        numeric (bool): as in parse(); optional
+        select (dict): as in parse(); optional
+        transport: async generator function that downloads URLs; defaults to
+                   default_transport(). Optional
+        executor (concurrent.futures.Executor): where parsing runs; defaults
+                                                to a thread pool of this
+                                                module. A thread pool must
+                                                not be the one the transport
+                                                downloads in. Optional
+        dimensions (str): as in parse(); optional
+
+    Returns:
+         pc_axis_dict (dictionary): same as parse()
+
+    """
+    loop = asyncio.get_running_loop()
+    chunks = aread_chunks(uri, encoding, timeout, verify, headers, chunk_size,
+                          transport)
+    parse_chunks = functools.partial(
+        parse_contents, null_values=null_values, sd_values=sd_values, lang=lang,
+        categorical=categorical, numeric=numeric, select=select,
+        dimensions=dimensions)
+    if executor is not None and not isinstance(
+            executor, concurrent.futures.ThreadPoolExecutor):
+        # a queue cannot reach another process: the body is sent whole
+        body = [chunk async for chunk in chunks]
+        return await loop.run_in_executor(executor, parse_chunks, body)
+
+    chunk_queue = queue.Queue()
+    parsing = loop.run_in_executor(executor or _parse_executor(), parse_chunks,
+                                   _iter_queue(chunk_queue))
+    try:
+        async for chunk in chunks:
+            chunk_queue.put(chunk)
+    except BaseException as error:
+        # stops the parser; the download error is the one raised
+        chunk_queue.put(error)
+        parsing.add_done_callback(lambda future: future.exception())
+        raise
+    chunk_queue.put(None)
+    return await parsing
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_executor():
+    """Return the thread pool aparse() parses in by default, created on first use.
+
+       It is apart from the default executor of the event loop, where
+       requests_transport() downloads, so parsers waiting for chunks never
+       hold the threads that would download them.
+    """
+    return concurrent.futures.ThreadPoolExecutor(thread_name_prefix='pyaxis-aparse')
+
+
+def _iter_queue(chunk_queue):
+    """Yield the chunks put on chunk_queue up to None, raising any exception put."""
+    while True:
+        chunk = chunk_queue.get()
+        if chunk is None:
+            return
+        if isinstance(chunk, BaseException):
+            raise chunk
+        yield chunk
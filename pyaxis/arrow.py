@@ -0,0 +1,203 @@
+"""Arrow: columnar export of PX files to Apache Arrow and Parquet.
+
+This module streams the DATA section of a PX file into Arrow record
+batches, without building the intermediate pandas DataFrame: dimension
+columns are dictionary-encoded over the VALUES of each dimension and DATA
+is a float64 column, null for null and statistical disclosure cells,
+which are flagged in the NULL and SD boolean columns. Batches are written
+to Parquet as they are parsed, one row group each.
+
+TITLE, UNITS, SOURCE, NOTE and CODES are stored as JSON in the key-value
+metadata of the schema.
+
+pyarrow is an optional dependency: pip install pyaxis[arrow]
+
+Example:
+    from pyaxis import arrow
+
+    arrow.to_parquet('census.px', 'census.parquet', encoding='ISO-8859-15')
+"""
+
+import json
+
+from pyaxis.data_processing import DATA_BLOCK_SIZE, cartesian_product_codes, \
+    get_dimensions, iter_data_blocks, parse_numeric_block
+from pyaxis.metadata_processing import metadata_extract_stream, \
+    metadata_split_to_dict, multilingual_parse
+from pyaxis.pyaxis import CHUNK_SIZE, read_chunks
+
+# metadata keywords stored in the key-value metadata of the schema
+SCHEMA_METADATA_KEYWORDS = ('TITLE', 'UNITS', 'SOURCE', 'NOTE', 'CODES')
+
+
+def import_pyarrow():
+    """Import pyarrow, which is an optional dependency."""
+    try:
+        import pyarrow  # pylint: disable=import-outside-toplevel
+    except ImportError as import_error:
+        raise ImportError('pyarrow is required for Arrow and Parquet export: '
+                          'pip install pyaxis[arrow]') from import_error
+    return pyarrow
+
+
+def schema_metadata(metadata):
+    """Select the metadata stored along the Arrow schema.
+
+    Args:
+        metadata (dict): dictionary of metadata
+
+    Returns:
+        schema_metadata (dict): keyword -> JSON encoded values
+
+    """
+    return {key: json.dumps(values, ensure_ascii=False)
+            for key, values in metadata.items()
+            if key.split('(', 1)[0] in SCHEMA_METADATA_KEYWORDS}
+
+
+def arrow_schema(metadata, dimension_names):
+    """Build the Arrow schema of a PX cube.
+
+    Args:
+        metadata (dict): dictionary of metadata
+        dimension_names (list of string)
+
+    Returns:
+        schema (pyarrow.Schema): dictionary-encoded dimensions, DATA, NULL and SD
+
+    """
+    pyarrow = import_pyarrow()
+    fields = [pyarrow.field(name, pyarrow.dictionary(pyarrow.int32(), pyarrow.string()))
+              for name in dimension_names]
+    fields.append(pyarrow.field('DATA', pyarrow.float64()))
+    fields.append(pyarrow.field('NULL', pyarrow.bool_()))
+    fields.append(pyarrow.field('SD', pyarrow.bool_()))
+    return pyarrow.schema(fields, metadata=schema_metadata(metadata))
+
+
+def iter_record_batches(schema, dimension_members, data_chunks, null_values,
+                        sd_values):
+    """Parse a chunked DATA section into Arrow record batches.
+
+    Args:
+        schema (pyarrow.Schema): as built by arrow_schema()
+        dimension_members (list of string)
+        data_chunks (iterable of str): data section, piece by piece
+        null_values(str): regex with the pattern for the null values in the px
+                          file.
+        sd_values(str): regex with the pattern for the statistical disclosured
+                        values in the px file.
+
+    Yields:
+        batch (pyarrow.RecordBatch): next rows of the cube
+
+    """
+    from pandas import Series, factorize  # pylint: disable=import-outside-toplevel
+
+    pyarrow = import_pyarrow()
+    sizes = [len(members) for members in dimension_members]
+    dictionaries = []
+    for members in dimension_members:
+        # repeated members share one dictionary entry
+        member_codes, uniques = factorize(Series(members, dtype=object))
+        dictionaries.append((member_codes.astype('int32'), pyarrow.array(uniques)))
+
+    sentinels = {}
+    start = 0
+    for block in iter_data_blocks(data_chunks):
+        data, null_mask, sd_mask = parse_numeric_block(
+            block, null_values, sd_values, sentinels)
+        if not len(data):
+            continue
+        stop = start + len(data)
+        columns = []
+        for codes, (member_codes, dictionary) in zip(
+                cartesian_product_codes(sizes, start, stop), dictionaries):
+            columns.append(pyarrow.DictionaryArray.from_arrays(
+                member_codes[codes], dictionary))
+        columns.append(pyarrow.array(data, mask=null_mask | sd_mask))
+        columns.append(pyarrow.array(null_mask))
+        columns.append(pyarrow.array(sd_mask))
+        yield pyarrow.RecordBatch.from_arrays(columns, schema=schema)
+        start = stop
+
+
+def record_batch_reader(uri, encoding, timeout=10, verify=True,
+                        null_values=r'^"\."$', sd_values=r'"\.\."',
+                        lang=None, headers=None, chunk_size=CHUNK_SIZE,
+                        session=None, response_cache=None):
+    """Read a PX file or URL as a stream of Arrow record batches.
+
+    Args:
+        uri (str): file name or URL
+        encoding (str): charset encoding
+        timeout (int): request timeout in seconds; optional
+        verify (bool, str): verify server TLS certificate or not, or path to cert file; optional
+        null_values(str): regex with the pattern for the null values in the px
+                          file. Defaults to '.'.
+        sd_values(str): regex with the pattern for the statistical disclosured
+                        values in the px file. Defaults to '..'.
+        lang: language desired for the metadata and the column names; optional
+        headers (str): HTTP headers; optional
+        chunk_size (int): number of characters read per step; optional
+        session (requests.Session): session to download with; optional
+        response_cache (pyaxis.cache.ResponseCache): local copy of downloaded
+                                                     files; optional
+
+    Returns:
+        reader (pyarrow.RecordBatchReader): schema is known before the DATA
+                                            section is read
+
+    """
+    pyarrow = import_pyarrow()
+    chunks = read_chunks(uri, encoding, timeout, verify, headers, chunk_size,
+                         session, response_cache)
+    metadata_elements, data_chunks = metadata_extract_stream(chunks)
+    metadata, _ = multilingual_parse(metadata_split_to_dict(metadata_elements), lang)
+    dimension_names, dimension_members = get_dimensions(metadata)
+    schema = arrow_schema(metadata, dimension_names)
+    return pyarrow.RecordBatchReader.from_batches(schema, iter_record_batches(
+        schema, dimension_members, data_chunks, null_values, sd_values))
+
+
+def to_parquet(uri, out_path, encoding, timeout=10, verify=True,
+               null_values=r'^"\."$', sd_values=r'"\.\."',
+               lang=None, headers=None, chunk_size=CHUNK_SIZE,
+               session=None, response_cache=None, compression='snappy'):
+    """Convert a PX file or URL to Parquet, one row group per parsed block.
+
+    Args:
+        uri (str): file name or URL
+        out_path (str): Parquet file name
+        encoding (str): charset encoding
+        timeout (int): request timeout in seconds; optional
+        verify (bool, str): verify server TLS certificate or not, or path to cert file; optional
+        null_values(str): regex with the pattern for the null values in the px
+                          file. Defaults to '.'.
+        sd_values(str): regex with the pattern for the statistical disclosured
+                        values in the px file. Defaults to '..'.
+        lang: language desired for the metadata and the column names; optional
+        headers (str): HTTP headers; optional
+        chunk_size (int): number of characters read per step; optional
+        session (requests.Session): session to download with; optional
+        response_cache (pyaxis.cache.ResponseCache): local copy of downloaded
+                                                     files; optional
+        compression (str): Parquet compression codec; optional
+
+    Returns:
+        rows (int): number of rows written
+
+    """
+    import_pyarrow()
+    from pyarrow import parquet  # pylint: disable=import-outside-toplevel
+
+    reader = record_batch_reader(uri, encoding, timeout, verify, null_values,
+                                 sd_values, lang, headers, chunk_size, session,
+                                 response_cache)
+    rows = 0
+    with parquet.ParquetWriter(out_path, reader.schema,
+                               compression=compression) as writer:
+        for batch in reader:
+            writer.write_batch(batch, row_group_size=DATA_BLOCK_SIZE)
+            rows += batch.num_rows
+    return rows
@@ -0,0 +1,448 @@
+"""Cache: persistent on-disk cache of parsed PX files.
+
+This module stores the result of parse() (METADATA, DATA, TRANSLATION...)
+in a directory, keyed by the identity of the source and the parse options,
+so repeated parses of unchanged files become a cheap load. Local files are
+identified by path, size and modification time; URLs by the ETag and
+Last-Modified validators returned by the server. The directory is kept
+under a size limit by evicting the least recently used entries.
+
+Entries are NumPy .npz archives: the DATA, FLAGS and LOOKUP dataframes
+and arrays as plain arrays, METADATA and TRANSLATION as JSON. They are
+loaded without pickle, so a cache entry cannot run code.
+
+ResponseCache keeps the raw downloads instead, to revalidate them with
+conditional GETs in read() and read_chunks().
+
+Example:
+    from pyaxis import pyaxis
+    from pyaxis.cache import ParseCache
+
+    cache = ParseCache('/tmp/pyaxis-cache', max_bytes=2 * 1024 ** 3)
+    px = pyaxis.parse('census.px', encoding='ISO-8859-15', cache=cache)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import zipfile
+
+from numpy import asarray, concatenate, frombuffer, load, min_scalar_type, savez, uint8
+
+from pyaxis.pyaxis import uri_type, url_validators
+
+logger = logging.getLogger(__name__)
+
+# default location of the cache directory
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache', 'pyaxis')
+# default size limit of the cache directory, in bytes
+DEFAULT_MAX_BYTES = 1 << 30
+ENTRY_SUFFIX = '.npz'
+
+
+class ParseCache:
+    """Directory of parsed PX files with a size limit and LRU eviction.
+
+    Attributes:
+        directory (str): where entries are stored
+        max_bytes (int): size limit of all entries together
+
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or DEFAULT_DIRECTORY
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, uri, options, timeout=10, verify=True, headers=None, session=None):
+        """Compute the cache key of a source and its parse options.
+
+        Args:
+            uri (str): file name or URL
+            options (dict): parse options that change the result
+            timeout (int): request timeout for URL validators; optional
+            verify (bool, str): verify server TLS certificate or not; optional
+            headers (str): HTTP headers; optional
+            session (requests.Session): session for URL validators; optional
+
+        Returns:
+            key (str): hexadecimal digest, or None if the source cannot be
+                       identified (a URL without ETag nor Last-Modified)
+
+        """
+        if uri_type(uri) == 'URL':
+            validators = url_validators(uri, timeout, verify, headers, session)
+            if not validators:
+                return None
+            # headers such as Accept-Language may change the body
+            identity = ['URL', uri, validators, dict(headers or {})]
+        else:
+            stat = os.stat(uri)
+            identity = ['FILE', os.path.abspath(uri), stat.st_size, stat.st_mtime_ns]
+        text = json.dumps([identity, options], sort_keys=True, default=str)
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def entry_path(self, key):
+        """Path of the entry of a key."""
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+    def get(self, key):
+        """Load a cached parse result.
+
+        Args:
+            key (str): cache key
+
+        Returns:
+            parsed_pc_axis (dict): or None if not cached
+
+        """
+        path = self.entry_path(key)
+        try:
+            with open(path, 'rb') as file_object:
+                parsed_pc_axis = load_entry(file_object)
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, EOFError, OSError, zipfile.BadZipFile):
+            logger.warning('Discarding unreadable cache entry %s', path)
+            self.discard(key)
+            return None
+        # mark as recently used
+        os.utime(path)
+        return parsed_pc_axis
+
+    def put(self, key, parsed_pc_axis):
+        """Store a parse result and evict old entries beyond the size limit.
+
+        Args:
+            key (str): cache key
+            parsed_pc_axis (dict): result of parse()
+
+        """
+        handle, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as file_object:
+                dump_entry(parsed_pc_axis, file_object)
+            os.replace(temporary, self.entry_path(key))
+        except (TypeError, ValueError) as unsupported:
+            os.remove(temporary)
+            logger.warning('Parse result not cached: %s', str(unsupported))
+            return
+        except BaseException:
+            os.remove(temporary)
+            raise
+        self.evict()
+
+    def discard(self, key):
+        """Remove the entry of a key, if any."""
+        try:
+            os.remove(self.entry_path(key))
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        """Remove least recently used entries until under max_bytes."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(ENTRY_SUFFIX):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        """Remove every entry."""
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(ENTRY_SUFFIX):
+                os.remove(entry.path)
+
+
+def dump_entry(parsed_pc_axis, file_object):
+    """Write a parse result as an .npz archive, without pickle.
+
+    Args:
+        parsed_pc_axis (dict): result of parse(); dataframes, dicts of
+                               arrays, dicts of dataframes and JSON values
+        file_object: writable binary stream
+
+    Raises:
+        TypeError: if a value cannot be stored without pickle
+
+    """
+    from pandas import DataFrame  # pylint: disable=import-outside-toplevel
+
+    arrays = {}
+    layout = {}
+    for key, value in parsed_pc_axis.items():
+        if isinstance(value, DataFrame):
+            layout[key] = {'frame': frame_layout(value, arrays)}
+        elif isinstance(value, dict) and value and \
+                all(isinstance(item, DataFrame) for item in value.values()):
+            layout[key] = {'frames': [[name, frame_layout(item, arrays)]
+                                      for name, item in value.items()]}
+        elif isinstance(value, dict) and value and \
+                all(hasattr(item, 'dtype') for item in value.values()):
+            layout[key] = {'arrays': [[name, add_array(asarray(item), arrays)]
+                                      for name, item in value.items()]}
+        else:
+            layout[key] = {'json': value}
+    arrays['layout'] = frombuffer(json.dumps(layout).encode('utf-8'), dtype=uint8)
+    savez(file_object, **arrays)
+
+
+def load_entry(file_object):
+    """Read a parse result written by dump_entry().
+
+    Args:
+        file_object: readable binary stream
+
+    Returns:
+        parsed_pc_axis (dict)
+
+    """
+    with load(file_object, allow_pickle=False) as arrays:
+        layout = json.loads(arrays['layout'].tobytes().decode('utf-8'))
+        parsed_pc_axis = {}
+        for key, stored in layout.items():
+            if 'frame' in stored:
+                parsed_pc_axis[key] = layout_frame(stored['frame'], arrays)
+            elif 'frames' in stored:
+                parsed_pc_axis[key] = {name: layout_frame(frame, arrays)
+                                       for name, frame in stored['frames']}
+            elif 'arrays' in stored:
+                parsed_pc_axis[key] = {name: arrays[array_name]
+                                       for name, array_name in stored['arrays']}
+            else:
+                parsed_pc_axis[key] = stored['json']
+    return parsed_pc_axis
+
+
+def add_array(array, arrays):
+    """Add an array to those of an entry and return its name."""
+    if array.dtype.kind not in 'biufU':
+        raise TypeError('arrays of dtype ' + str(array.dtype) + ' are not cached')
+    name = 'a' + str(len(arrays))
+    arrays[name] = array
+    return name
+
+
+def frame_layout(d_f, arrays):
+    """Add the columns and index of a dataframe to the arrays of an entry.
+
+       Categorical and text columns are stored as integer codes plus their
+       distinct values; text columns may hold NaN, coded as -1.
+
+    Args:
+        d_f (pandas dataframe)
+        arrays (dict): arrays of the entry, by name
+
+    Returns:
+        layout (dict): how to rebuild the dataframe from the arrays
+
+    """
+    from pandas import CategoricalDtype, RangeIndex, \
+        factorize  # pylint: disable=import-outside-toplevel
+
+    columns = []
+    for name, column in d_f.items():
+        if isinstance(column.dtype, CategoricalDtype):
+            columns.append({
+                'name': name, 'ordered': bool(column.cat.ordered),
+                'codes': add_array(column.cat.codes.to_numpy(), arrays),
+                'categories': add_array(category_array(column.cat.categories), arrays)})
+        elif column.dtype == object:
+            codes, uniques = factorize(column)
+            if not all(isinstance(value, str) for value in uniques):
+                raise TypeError('column ' + str(name) + ' holds values other than text')
+            columns.append({
+                'name': name,
+                # the smallest signed type holding -1 and every code
+                'text_codes': add_array(
+                    codes.astype(min_scalar_type(-max(len(uniques), 1))), arrays),
+                'text': add_array(asarray(uniques.tolist(), dtype=str), arrays)})
+        else:
+            columns.append({'name': name,
+                            'values': add_array(column.to_numpy(), arrays)})
+    if isinstance(d_f.index, RangeIndex):
+        index = {'range': [d_f.index.start, d_f.index.stop, d_f.index.step]}
+    else:
+        index = {'values': add_array(d_f.index.to_numpy(), arrays)}
+    index['name'] = d_f.index.name
+    return {'columns': columns, 'index': index}
+
+
+def category_array(categories):
+    """Array of the categories of a column, text as a NumPy string array."""
+    if categories.dtype == object:
+        if not all(isinstance(value, str) for value in categories):
+            raise TypeError('categories other than text are not cached')
+        return asarray(categories.tolist(), dtype=str)
+    return categories.to_numpy()
+
+
+def layout_frame(layout, arrays):
+    """Rebuild a dataframe stored by frame_layout()."""
+    # pylint: disable=import-outside-toplevel
+    from pandas import Categorical, DataFrame, Index, RangeIndex
+
+    columns = {}
+    for column in layout['columns']:
+        if 'codes' in column:
+            columns[column['name']] = Categorical.from_codes(
+                arrays[column['codes']],
+                category_values(arrays[column['categories']]),
+                ordered=column['ordered'])
+        elif 'text_codes' in column:
+            # NaN goes last, where code -1 points
+            text = concatenate([category_values(arrays[column['text']]),
+                                asarray([float('nan')], dtype=object)])
+            columns[column['name']] = text[arrays[column['text_codes']]]
+        else:
+            columns[column['name']] = arrays[column['values']]
+    index = layout['index']
+    if 'range' in index:
+        index = RangeIndex(*index['range'], name=index['name'])
+    else:
+        index = Index(arrays[index['values']], name=index['name'])
+    return DataFrame(columns, columns=[column['name'] for column in layout['columns']],
+                     index=index)
+
+
+def category_values(array):
+    """Inverse of category_array(): text as Python strings in an object array."""
+    if array.dtype.kind == 'U':
+        return asarray(array.tolist(), dtype=object)
+    return array
+
+
+class ResponseCache:
+    """Local copies of downloaded PX files with their HTTP validators.
+
+       read() and read_chunks() send the stored ETag and Last-Modified as
+       If-None-Match and If-Modified-Since; a 304 answer is served from the
+       local copy without downloading the body again.
+
+    Attributes:
+        directory (str): where bodies and validators are stored
+
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or os.path.join(DEFAULT_DIRECTORY, 'responses')
+        os.makedirs(self.directory, exist_ok=True)
+
+    def paths(self, uri):
+        """Paths of the body and validators files of a URL."""
+        name = hashlib.sha256(uri.encode('utf-8')).hexdigest()
+        path = os.path.join(self.directory, name)
+        return path + '.body', path + '.json'
+
+    def conditional_headers(self, uri):
+        """Request headers that revalidate the local copy of a URL.
+
+        Args:
+            uri (str): URL
+
+        Returns:
+            headers (dict): If-None-Match and If-Modified-Since, or empty if
+                            there is no local copy
+
+        """
+        body_path, validators_path = self.paths(uri)
+        if not os.path.exists(body_path):
+            return {}
+        try:
+            with open(validators_path, encoding='utf-8') as file_object:
+                validators = json.load(file_object)
+        except (FileNotFoundError, ValueError):
+            return {}
+        headers = {}
+        if 'ETag' in validators:
+            headers['If-None-Match'] = validators['ETag']
+        if 'Last-Modified' in validators:
+            headers['If-Modified-Since'] = validators['Last-Modified']
+        return headers
+
+    def read(self, uri):
+        """Return the local copy of a URL, as bytes."""
+        with open(self.paths(uri)[0], 'rb') as file_object:
+            return file_object.read()
+
+    def iter_read(self, uri, chunk_size):
+        """Yield the local copy of a URL in chunks of bytes."""
+        with open(self.paths(uri)[0], 'rb') as file_object:
+            chunk = file_object.read(chunk_size)
+            while chunk:
+                yield chunk
+                chunk = file_object.read(chunk_size)
+
+    def store(self, uri, headers, content):
+        """Store the body of a response, if it has validators.
+
+        Args:
+            uri (str): URL
+            headers (dict): response headers
+            content (bytes): response body
+
+        """
+        writer = self.writer(uri, headers)
+        if writer is not None:
+            writer.write(content)
+            writer.commit()
+
+    def writer(self, uri, headers):
+        """Start storing a response body that arrives in pieces.
+
+        Args:
+            uri (str): URL
+            headers (dict): response headers
+
+        Returns:
+            writer (ResponseWriter): or None if the response has neither ETag
+                                     nor Last-Modified
+
+        """
+        validators = {name: headers[name] for name in ('ETag', 'Last-Modified')
+                      if name in headers}
+        if not validators:
+            return None
+        return ResponseWriter(self.directory, self.paths(uri), validators)
+
+
+class ResponseWriter:
+    """Temporary file that becomes the local copy of a URL on commit()."""
+
+    def __init__(self, directory, paths, validators):
+        self.paths = paths
+        self.validators = validators
+        handle, self.temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        self.file_object = os.fdopen(handle, 'wb')
+
+    def write(self, content):
+        """Append a piece of the body."""
+        self.file_object.write(content)
+
+    def commit(self):
+        """Replace the local copy with the complete body."""
+        if self.file_object.closed:
+            return
+        self.file_object.close()
+        body_path, validators_path = self.paths
+        os.replace(self.temporary, body_path)
+        with open(validators_path, 'w', encoding='utf-8') as file_object:
+            json.dump(self.validators, file_object)
+
+    def abort(self):
+        """Discard an incomplete body; no-op after commit()."""
+        if self.file_object.closed:
+            return
+        self.file_object.close()
+        os.remove(self.temporary)
@@ -0,0 +1,342 @@
+"""Cube: PX files as N-dimensional arrays, dense or sparse.
+
+The DATA section of a PX file is a row-major dense array whose axes are
+the STUB and HEADING variables, in that order. parse_cube() parses it into
+a float64 NumPy array of that shape, without building the long-format
+DataFrame, so memory is 8 bytes per cell plus the null and sd flags.
+to_xarray() wraps the array, without copying it, in an xarray.DataArray
+with the VALUES or CODES of each variable as coordinates.
+
+For mostly empty tables, parse_sparse() keeps only the populated cells,
+those that are neither null, disclosed nor unreadable, so memory scales
+with them instead of with the size of the cube.
+
+xarray is an optional dependency: pip install pyaxis[xarray]
+
+Example:
+    from pyaxis import cube
+
+    px = cube.parse_cube('census.px', encoding='ISO-8859-15')
+    data_array = cube.to_xarray(px)
+    data_array.sel(Sex='Women').sum('Age')
+
+    sparse = cube.parse_sparse('municipalities.px', encoding='ISO-8859-15',
+                               density_threshold=0.5)
+"""
+
+from numpy import asarray, concatenate, flatnonzero, full, isnan, nan, \
+    packbits, unpackbits, unravel_index
+
+from pyaxis.data_processing import categorical_column, get_decimals, get_dimensions, \
+    iter_data_blocks, member_codes, parse_numeric_block, parse_numeric_data
+from pyaxis.helpers_string import join_text
+from pyaxis.metadata_processing import metadata_split_to_dict, multilingual_parse
+from pyaxis.pyaxis import CHUNK_SIZE, read, read_chunks, split_contents
+
+
+def cube_shape(metadata):
+    """Shape of the cube: number of members of each STUB and HEADING variable.
+
+    Args:
+        metadata (dict): dictionary of metadata
+
+    Returns:
+        shape (tuple of int)
+
+    """
+    return tuple(len(members) for members in get_dimensions(metadata)[1])
+
+
+def parse_cube(uri, encoding, timeout=10, verify=True,
+               null_values=r'^"\."$', sd_values=r'"\.\."',
+               lang=None, headers=None, stream=False, chunk_size=CHUNK_SIZE,
+               session=None, response_cache=None):
+    """Parse a pc-axis file into an N-dimensional array.
+
+    Args:
+        uri (str): file name or URL
+        encoding (str): charset encoding
+        timeout (int): request timeout in seconds; optional
+        verify (bool, str): verify server TLS certificate or not, or path to cert file; optional
+        null_values(str): regex with the pattern for the null values in the px
+                          file. Defaults to '.'.
+        sd_values(str): regex with the pattern for the statistical disclosured
+                        values in the px file. Defaults to '..'.
+        lang: language desired for the metadata; optional
+        headers (str): HTTP headers; optional
+        stream (bool): read the file in chunks; optional
+        chunk_size (int): chunk size used when stream is True; optional
+        session (requests.Session): session to download with; optional
+        response_cache (pyaxis.cache.ResponseCache): local copy of downloaded
+                                                     files; optional
+
+    Returns:
+         pc_axis_dict (dictionary): METADATA and TRANSLATION as in parse();
+                                    DATA: float64 numpy array of shape
+                                    cube_shape(METADATA), NaN for null and sd
+                                    cells; FLAGS: 'NULL' and 'SD' boolean
+                                    arrays of the same shape
+
+    """
+    if stream:
+        contents = read_chunks(uri, encoding, timeout, verify, headers, chunk_size,
+                               session, response_cache)
+    else:
+        contents = read(uri, encoding, timeout, verify, headers, session,
+                        response_cache)
+    metadata_elements, data = split_contents(contents)
+    metadata, translation_dict = multilingual_parse(
+        metadata_split_to_dict(metadata_elements), lang)
+    values, null_mask, sd_mask = parse_numeric_data(data, null_values, sd_values)
+    shape = cube_shape(metadata)
+    return {
+        'METADATA': metadata,
+        'DATA': reshape_cube(values, shape),
+        'TRANSLATION': translation_dict,
+        'FLAGS': {'NULL': null_mask.reshape(shape), 'SD': sd_mask.reshape(shape)}
+    }
+
+
+def reshape_cube(values, shape):
+    """Reshape the vector of DATA values into the cube, without copying.
+
+    Args:
+        values (numpy array): cell values in file order
+        shape (tuple of int): as from cube_shape()
+
+    Returns:
+        array (numpy array): view of values with the given shape
+
+    """
+    check_cells(len(values), shape)
+    return values.reshape(shape)
+
+
+def check_cells(cells, shape):
+    """Raise ValueError if the DATA section does not fill the cube.
+
+    Args:
+        cells (int): number of cells of the DATA section
+        shape (tuple of int): as from cube_shape()
+
+    """
+    expected = 1
+    for size in shape:
+        expected *= size
+    if cells != expected:
+        raise ValueError('DATA holds ' + str(cells) + ' cells, ' +
+                         str(expected) + ' expected from STUB and HEADING')
+
+
+def to_ndarray(parsed_pc_axis):
+    """Get the cube of a parse result as an N-dimensional array.
+
+    Args:
+        parsed_pc_axis (dict): result of parse_cube(), or of parse() with
+                               numeric=True and without select
+
+    Returns:
+        array (numpy array): float64 array of shape cube_shape(METADATA);
+                             a view of the DATA column of parse() results
+
+    """
+    data = parsed_pc_axis['DATA']
+    if hasattr(data, 'columns'):
+        # DATA column of parse(numeric=True), in file order
+        data = data['DATA'].to_numpy(dtype='float64', copy=False)
+        return reshape_cube(data, cube_shape(parsed_pc_axis['METADATA']))
+    return data
+
+
+def to_xarray(parsed_pc_axis, coords='labels'):
+    """Wrap the cube of a parse result in a labelled xarray.DataArray.
+
+    Args:
+        parsed_pc_axis (dict): result of parse_cube(), or of parse() with
+                               numeric=True and without select
+        coords (str): coordinates of each dimension: 'labels' (VALUES) or
+                      'codes' (CODES, VALUES where there are none); optional
+
+    Returns:
+        data_array (xarray.DataArray): shares memory with the parse result;
+                                       TITLE, UNITS, SOURCE and DECIMALS as
+                                       attributes
+
+    """
+    try:
+        import xarray  # pylint: disable=import-outside-toplevel
+    except ImportError as import_error:
+        raise ImportError('xarray is required for to_xarray(): '
+                          'pip install pyaxis[xarray]') from import_error
+    if coords not in ('labels', 'codes'):
+        raise ValueError("coords must be 'labels' or 'codes'")
+
+    metadata = parsed_pc_axis['METADATA']
+    dimension_names, dimension_members = get_dimensions(metadata)
+    if coords == 'codes':
+        dimension_members = member_codes(metadata)
+    attrs = {key.lower(): join_text(metadata[key])
+             for key in ('TITLE', 'UNITS', 'SOURCE') if key in metadata}
+    if get_decimals(metadata) is not None:
+        attrs['decimals'] = get_decimals(metadata)
+    return xarray.DataArray(
+        to_ndarray(parsed_pc_axis), dims=dimension_names,
+        coords=dict(zip(dimension_names, dimension_members)), attrs=attrs)
+
+
+def populated_cells(data_chunks, null_values, sd_values, flags=False):
+    """Parse a chunked DATA section keeping only the populated cells.
+
+    Args:
+        data_chunks (iterable of str): data section, piece by piece
+        null_values(str): regex with the pattern for the null values in the px
+                          file.
+        sd_values(str): regex with the pattern for the statistical disclosured
+                        values in the px file.
+        flags (bool): also keep the null and sd flags of every cell, packed
+                      in two bits per cell; optional
+
+    Returns:
+        positions (numpy array): int64 positions of the populated cells
+        values (numpy array): float64 values of those cells
+        cells (int): number of cells of the DATA section
+        packed_flags (list of tuple): packed null flags, packed sd flags and
+                                      number of cells of each block if flags
+                                      is True, else None; see unpack_flags()
+
+    """
+    positions = []
+    values = []
+    packed_flags = []
+    cells = 0
+    sentinels = {}
+    for block in iter_data_blocks(data_chunks):
+        data, null_mask, sd_mask = parse_numeric_block(
+            block, null_values, sd_values, sentinels)
+        # null and sd cells are NaN too
+        populated = flatnonzero(~isnan(data))
+        positions.append(cells + populated)
+        values.append(data[populated])
+        if flags:
+            packed_flags.append((packbits(null_mask), packbits(sd_mask), len(data)))
+        cells += len(data)
+    positions = concatenate(positions + [asarray([], dtype='int64')])
+    values = concatenate(values + [asarray([], dtype='float64')])
+    return positions, values, cells, packed_flags if flags else None
+
+
+def unpack_flags(packed_flags, flag):
+    """Unpack a flag kept by populated_cells() into a boolean mask of every cell.
+
+    Args:
+        packed_flags (list of tuple): as returned by populated_cells()
+        flag (str): 'NULL' | 'SD'
+
+    Returns:
+        mask (numpy array)
+
+    """
+    column = ('NULL', 'SD').index(flag)
+    return concatenate(
+        [unpackbits(block[column], count=block[2]).astype(bool)
+         for block in packed_flags] + [asarray([], dtype=bool)])
+
+
+def parse_sparse(uri, encoding, timeout=10, verify=True,
+                 null_values=r'^"\."$', sd_values=r'"\.\."',
+                 lang=None, headers=None, chunk_size=CHUNK_SIZE,
+                 session=None, response_cache=None, density_threshold=None):
+    """Parse only the populated cells of a pc-axis file.
+
+       The file is read in chunks and each chunk is reduced to its
+       populated cells before the next one is read. With density_threshold,
+       the null and sd flags of every cell are kept too, packed in two bits
+       per cell, in case the dense array is returned.
+
+    Args:
+        uri (str): file name or URL
+        encoding (str): charset encoding
+        timeout (int): request timeout in seconds; optional
+        verify (bool, str): verify server TLS certificate or not, or path to cert file; optional
+        null_values(str): regex with the pattern for the null values in the px
+                          file. Defaults to '.'.
+        sd_values(str): regex with the pattern for the statistical disclosured
+                        values in the px file. Defaults to '..'.
+        lang: language desired for the metadata and the column names; optional
+        headers (str): HTTP headers; optional
+        chunk_size (int): number of characters read per step; optional
+        session (requests.Session): session to download with; optional
+        response_cache (pyaxis.cache.ResponseCache): local copy of downloaded
+                                                     files; optional
+        density_threshold (float): share of populated cells from which the
+                                   dense array is returned instead; optional
+
+    Returns:
+         pc_axis_dict (dictionary): METADATA and TRANSLATION as in parse();
+                                    DENSITY: share of populated cells;
+                                    SPARSE: True if DATA is a pandas dataframe
+                                    of the populated cells, with categorical
+                                    dimension columns and DATA, indexed by the
+                                    position of the cell in the cube; False if
+                                    density_threshold was reached and DATA is
+                                    a float64 array of shape cube_shape(),
+                                    NaN in the cells not populated, with FLAGS
+                                    as in parse_cube()
+
+    """
+    from pandas import DataFrame, Index  # pylint: disable=import-outside-toplevel
+
+    chunks = read_chunks(uri, encoding, timeout, verify, headers, chunk_size,
+                         session, response_cache)
+    metadata_elements, data_chunks = split_contents(chunks)
+    metadata, translation_dict = multilingual_parse(
+        metadata_split_to_dict(metadata_elements), lang)
+    positions, values, cells, packed_flags = populated_cells(
+        data_chunks, null_values, sd_values, flags=density_threshold is not None)
+    shape = cube_shape(metadata)
+    check_cells(cells, shape)
+    density = len(positions) / cells if cells else 0.0
+
+    parsed_pc_axis = {
+        'METADATA': metadata,
+        'TRANSLATION': translation_dict,
+        'DENSITY': density
+    }
+    if density_threshold is not None and density >= density_threshold:
+        data = full(cells, nan)
+        data[positions] = values
+        parsed_pc_axis['DATA'] = data.reshape(shape)
+        parsed_pc_axis['FLAGS'] = {flag: unpack_flags(packed_flags, flag).reshape(shape)
+                                   for flag in ('NULL', 'SD')}
+        parsed_pc_axis['SPARSE'] = False
+        return parsed_pc_axis
+
+    dimension_names, dimension_members = get_dimensions(metadata)
+    columns = {}
+    for name, members, codes in zip(dimension_names, dimension_members,
+                                    unravel_index(positions, shape)):
+        columns[name] = categorical_column(members, codes)
+    columns['DATA'] = values
+    parsed_pc_axis['DATA'] = DataFrame(columns, columns=dimension_names + ['DATA'],
+                                       index=Index(positions))
+    parsed_pc_axis['SPARSE'] = True
+    return parsed_pc_axis
+
+
+def to_coo(parsed_pc_axis):
+    """Get the populated cells of a sparse parse result in coordinate format.
+
+    Args:
+        parsed_pc_axis (dict): result of parse_sparse() with SPARSE True
+
+    Returns:
+        coords (numpy array): int64 array of shape (dimensions, cells) with
+                              the position of each cell along each axis
+        values (numpy array): float64 values of the cells
+        shape (tuple of int): shape of the whole cube
+
+    """
+    shape = cube_shape(parsed_pc_axis['METADATA'])
+    d_f = parsed_pc_axis['DATA']
+    coords = asarray(unravel_index(d_f.index.to_numpy(), shape), dtype='int64')
+    return coords.reshape(len(shape), len(d_f)), d_f['DATA'].to_numpy(), shape
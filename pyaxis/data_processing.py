@@ -4,9 +4,20 @@ This module contains all the necessary functions to extract the DATA field
 of the PX file and build the structure of the dataframe based on the metadata.
 """
 
-import itertools
-from numpy import nan, where
-from pandas import DataFrame
+import re
+import warnings
+
+from numpy import arange, asarray, concatenate, fromstring, inf, isinf, ix_, \
+    min_scalar_type, nan, prod, ravel_multi_index, round as round_, searchsorted
+
+from pyaxis.helpers_string import regex_literal
+
+# quoted DATA values without blanks inside, such as "." or ".."
+QUOTED_VALUE = re.compile(r'"[^"\s]*"')
+# letters of unquoted inf and nan, which clash with the bulk parsing sentinels
+SENTINEL_LETTERS = re.compile('[iInN]')
+# characters of DATA parsed at a time in bulk numeric parsing
+DATA_BLOCK_SIZE = 1 << 22
 
 def get_dimensions(metadata):
     """Read STUB and HEADING values from metadata dictionary.
@@ -88,11 +99,570 @@ def get_codes(metadata):
 
     return dimensions_with_codes, dimension_codes
 
+
+def iter_data_tokens(data_chunks):
+    """Split a chunked DATA section into lists of values.
+
+       Values cut in two by a chunk boundary are carried over and joined
+       with the beginning of the next chunk.
+
+    Args:
+        data_chunks (iterable of str): data section, piece by piece
+
+    Yields:
+        tokens (list of string): whitespace separated values of each chunk
+
+    """
+    carry = ''
+    for chunk in data_chunks:
+        text = carry + chunk
+        tokens = text.split()
+        if tokens and not text[-1].isspace():
+            carry = tokens.pop()
+        else:
+            carry = ''
+        if tokens:
+            yield tokens
+    if carry:
+        yield [carry]
+
+
+def read_data_tokens(data_chunks):
+    """Collect every value of a chunked DATA section into a single list.
+
+    Args:
+        data_chunks (iterable of str): data section, piece by piece
+
+    Returns:
+        data_values (list of string): whitespace separated values
+
+    """
+    data_values = []
+    for tokens in iter_data_tokens(data_chunks):
+        data_values.extend(tokens)
+    return data_values
+
+
+def cartesian_product_codes(dimension_sizes, start=0, stop=None):
+    """Compute member positions for a slice of the cartesian product.
+
+       PX data is laid out in row-major order of the dimension members, so
+       the member of each dimension for row i follows from integer
+       arithmetic instead of enumerating the product.
+
+    Args:
+        dimension_sizes (list of int): number of members of each dimension
+        start (int): first row of the slice
+        stop (int): row after the last one of the slice; defaults to the
+                    total number of rows
+
+    Returns:
+        codes (list of numpy arrays): member positions of each dimension
+
+    """
+    total = int(prod(dimension_sizes, dtype='int64'))
+    if stop is None or stop > total:
+        stop = total
+    rows = arange(start, max(stop, start), dtype='int64')
+    codes = []
+    stride = total
+    for size in dimension_sizes:
+        stride = stride // size if size else 0
+        if stride:
+            codes.append((rows // stride) % size)
+        else:
+            codes.append(rows[:0])
+    return codes
+
+
+def dimension_columns(dimension_names, dimension_members, start=0, stop=None,
+                      categorical=False):
+    """Build the dimension columns for a slice of the cartesian product.
+
+    Args:
+        dimension_names (list of string)
+        dimension_members (list of string)
+        start (int): first row of the slice
+        stop (int): row after the last one of the slice; optional
+        categorical (bool): emit pandas.Categorical columns whose categories
+                            are the dimension members in file order; optional
+
+    Returns:
+        df (pandas dataframe): one column per dimension, indexed by row number
+
+    """
+    from pandas import DataFrame, RangeIndex  # pylint: disable=import-outside-toplevel
+
+    sizes = [len(members) for members in dimension_members]
+    codes = cartesian_product_codes(sizes, start, stop)
+    total = int(prod(sizes, dtype='int64'))
+    stop = max(total if stop is None else min(stop, total), start)
+    columns = {}
+    for name, members, member_codes in zip(dimension_names, dimension_members, codes):
+        if categorical:
+            columns[name] = categorical_column(members, member_codes)
+        else:
+            columns[name] = asarray(members, dtype=object)[member_codes]
+    return DataFrame(columns, columns=dimension_names, index=RangeIndex(start, stop))
+
+
+def categorical_column(members, member_codes):
+    """Build an ordered categorical column from member positions.
+
+    Args:
+        members (list of string): dimension members in file order
+        member_codes (numpy array): position of the member of each row
+
+    Returns:
+        column (pandas Categorical)
+
+    """
+    from pandas import Categorical, factorize  # pylint: disable=import-outside-toplevel
+
+    # repeated members share a single category, in order of first appearance
+    member_to_category, categories = factorize(asarray(members, dtype=object))
+    return Categorical.from_codes(member_to_category[member_codes],
+                                  categories=categories, ordered=True)
+
+
+def relabel_dimension_columns(d_f, dimension_names, dimension_members,
+                              label_names, label_members):
+    """Rename the dimension columns of a dataframe and their members.
+
+       Categorical columns only get new categories, so relabelling costs
+       the number of members rather than the number of rows. The DATA
+       column is shared with the original dataframe, not copied.
+
+    Args:
+        d_f (pandas dataframe): dimension columns followed by DATA
+        dimension_names (list of string): current names of the dimensions
+        dimension_members (list of string): current members of each dimension
+        label_names (list of string): new names of the dimensions
+        label_members (list of string): new members of each dimension, in the
+                                        same order as dimension_members
+    Returns:
+        df (pandas dataframe)
+
+    """
+    from pandas import Categorical, factorize  # pylint: disable=import-outside-toplevel
+
+    relabelled = d_f.copy(deep=False)
+    for name, members, labels in zip(dimension_names, dimension_members, label_members):
+        mapping = {}
+        for member, label in zip(members, labels):
+            mapping.setdefault(member, label)
+        column = relabelled[name]
+        if hasattr(column, 'cat'):
+            categories = [mapping[category] for category in column.cat.categories]
+            # labels shared by several members merge their categories
+            category_codes, uniques = factorize(asarray(categories, dtype=object))
+            relabelled[name] = Categorical.from_codes(
+                category_codes[column.cat.codes], categories=uniques,
+                ordered=column.cat.ordered)
+        else:
+            relabelled[name] = column.map(mapping)
+    relabelled.columns = list(label_names) + list(d_f.columns[len(dimension_names):])
+    return relabelled
+
+
+def index_dimension_columns(d_f, dimension_names, dimension_members):
+    """Replace categorical dimension columns by the positions of their members.
+
+    Args:
+        d_f (pandas dataframe): categorical dimension columns followed by DATA
+        dimension_names (list of string)
+        dimension_members (list of string): all the members of each dimension,
+                                            in VALUES order
+    Returns:
+        df (pandas dataframe): dimension columns as the smallest unsigned
+                               integers that hold the positions in VALUES
+
+    """
+    indexed = d_f.copy(deep=False)
+    for name, members in zip(dimension_names, dimension_members):
+        positions = {}
+        for position, member in enumerate(members):
+            positions.setdefault(member, position)
+        column = indexed[name]
+        category_positions = asarray(
+            [positions[category] for category in column.cat.categories],
+            dtype=min_scalar_type(max(len(members) - 1, 0)))
+        indexed[name] = category_positions[column.cat.codes.to_numpy()]
+    return indexed
+
+
+def member_codes(metadata):
+    """Get the CODES of the members of each dimension, VALUES if it has none.
+
+    Args:
+        metadata (dict): dictionary of metadata
+
+    Returns:
+        codes (list of list of string): one list per dimension, STUB first
+
+    """
+    dimension_names, dimension_members = get_dimensions(metadata)
+    dimensions_with_codes, dimension_codes = get_codes(metadata)
+    codes = dict(zip(dimensions_with_codes, dimension_codes))
+    return [codes.get(name, members)
+            for name, members in zip(dimension_names, dimension_members)]
+
+
+def lookup_tables(metadata, language_metadata=None):
+    """Build a table per dimension from member position to code and labels.
+
+    Args:
+        metadata (dict): dictionary of metadata, in the language of the parse
+        language_metadata (dict): language -> dictionary of metadata in that
+                                  language, for multilingual files; optional
+
+    Returns:
+        lookup (dict): dimension name -> pandas dataframe indexed by the
+                       position of the member in VALUES, with columns CODE,
+                       LABEL and LABEL[xx] for each language
+
+    """
+    from pandas import DataFrame, RangeIndex  # pylint: disable=import-outside-toplevel
+
+    dimension_names, dimension_members = get_dimensions(metadata)
+    codes = member_codes(metadata)
+    language_members = {language: get_dimensions(lang_metadata)[1]
+                        for language, lang_metadata in (language_metadata or {}).items()}
+    lookup = {}
+    for position, name in enumerate(dimension_names):
+        columns = {'CODE': codes[position], 'LABEL': dimension_members[position]}
+        for language, members in language_members.items():
+            columns['LABEL[' + language + ']'] = members[position]
+        lookup[name] = DataFrame(
+            columns, index=RangeIndex(len(dimension_members[position]), name='INDEX'))
+    return lookup
+
+
+def classify_data_values(data_values, null_values, sd_values):
+    """Flag the null and statistical disclosure values of the data.
+
+       Patterns that are plain literals, like the default ones, are checked
+       without regular expressions: exact literals by a vectorized equality
+       test, prefixes and real regular expressions only against the distinct
+       values of the data, which are then mapped back to every cell.
+
+    Args:
+        data_values(Series): pandas series with the data values column.
+        null_values(str): regex with the pattern for the null values in the px
+                          file.
+        sd_values(str): regex with the pattern for the statistical disclosured
+                        values in the px file.
+    Returns:
+        null_mask (numpy array): True for null cells.
+        sd_mask (numpy array): True for statistical disclosure cells; takes
+                               precedence over null_mask.
+
+    """
+    values = asarray(data_values, dtype=object)
+    distinct = {}
+
+    def match(pattern):
+        literal = regex_literal(pattern)
+        if literal is not None and literal[1]:
+            return values == literal[0]
+        if not distinct:
+            from pandas import factorize  # pylint: disable=import-outside-toplevel
+            distinct['codes'], distinct['uniques'] = factorize(values)
+        uniques = distinct['uniques']
+        if literal is not None:
+            matched = [unique.startswith(literal[0]) for unique in uniques]
+        else:
+            regex = re.compile(pattern)
+            matched = [regex.match(unique) is not None for unique in uniques]
+        # append False for the -1 code of missing values
+        return asarray(matched + [False], dtype=bool)[distinct['codes']]
+
+    sd_mask = match(sd_values)
+    null_mask = match(null_values) & ~sd_mask
+    return null_mask, sd_mask
+
+
+def mask_data_values(data_values, null_values, sd_values):
+    """Replace null and statistical disclosure values.
+
+    Args:
+        data_values(Series): pandas series with the data values column.
+        null_values(str): regex with the pattern for the null values in the px
+                          file. Replaced by ''.
+        sd_values(str): regex with the pattern for the statistical disclosured
+                        values in the px file. Replaced by NaN.
+    Returns:
+        data (numpy array)
+
+    """
+    null_mask, sd_mask = classify_data_values(data_values, null_values, sd_values)
+    data = asarray(data_values, dtype=object).copy()
+    data[null_mask] = ''
+    data[sd_mask] = nan
+    return data
+
+
+def numeric_data_values(data_values, null_values, sd_values, decimals=None):
+    """Convert the data values into floats plus null and disclosure flags.
+
+    Args:
+        data_values(Series): pandas series with the data values column.
+        null_values(str): regex with the pattern for the null values in the px
+                          file.
+        sd_values(str): regex with the pattern for the statistical disclosured
+                        values in the px file.
+        decimals(int): number of decimals to round the values to; by default
+                       they are kept as written in the file. Optional
+    Returns:
+        data (numpy array): float64 values, NaN for null and sd cells.
+        null_mask (numpy array): True for null cells.
+        sd_mask (numpy array): True for statistical disclosure cells.
+
+    """
+    from pandas import to_numeric  # pylint: disable=import-outside-toplevel
+
+    null_mask, sd_mask = classify_data_values(data_values, null_values, sd_values)
+
+    data = to_numeric(data_values, errors='coerce').to_numpy(dtype='float64', copy=True)
+    data[null_mask | sd_mask] = nan
+    if decimals is not None:
+        round_(data, int(decimals), out=data)
+
+    return data, null_mask, sd_mask
+
+
+def selection_offsets(dimension_names, dimension_members, select):
+    """Compute the positions in the DATA section of a selection of members.
+
+    Args:
+        dimension_names (list of string)
+        dimension_members (list of string)
+        select (dict): {dimension name: member or list of members}; dimensions
+                       left out keep all their members
+
+    Returns:
+        offsets (numpy array): sorted positions of the selected cells
+        selected_members (list of string): members kept for each dimension,
+                                           in file order
+
+    """
+    unknown = set(select) - set(dimension_names)
+    if unknown:
+        raise ValueError('Unknown dimensions in selection: ' + ', '.join(sorted(unknown)))
+    indices = []
+    selected_members = []
+    for name, members in zip(dimension_names, dimension_members):
+        if name not in select:
+            indices.append(arange(len(members)))
+            selected_members.append(members)
+            continue
+        wanted = select[name]
+        if isinstance(wanted, str):
+            wanted = [wanted]
+        missing = set(wanted) - set(members)
+        if missing:
+            raise ValueError('Unknown members of ' + name + ': ' + ', '.join(sorted(missing)))
+        wanted = set(wanted)
+        positions = [i for i, member in enumerate(members) if member in wanted]
+        indices.append(asarray(positions, dtype='int64'))
+        selected_members.append([members[i] for i in positions])
+    sizes = [len(members) for members in dimension_members]
+    offsets = ravel_multi_index(ix_(*indices), sizes).ravel() if sizes else arange(1)
+    return offsets, selected_members
+
+
+def select_data_tokens(data_chunks, offsets):
+    """Collect the values at the given positions of a chunked DATA section.
+
+       Only the selected values are kept, and the chunks are no longer
+       consumed once the last position has been reached.
+
+    Args:
+        data_chunks (iterable of str): data section, piece by piece
+        offsets (numpy array): sorted positions of the values to keep
+
+    Returns:
+        data_values (list of string): selected values, in order
+
+    """
+    selected = []
+    start = 0
+    first = 0
+    if not len(offsets):
+        return selected
+    for tokens in iter_data_tokens(data_chunks):
+        stop = start + len(tokens)
+        last = int(searchsorted(offsets, stop))
+        selected.extend(tokens[offset - start] for offset in offsets[first:last].tolist())
+        if last == len(offsets):
+            break
+        first = last
+        start = stop
+    return selected
+
+
+def iter_data_blocks(data_chunks):
+    """Regroup a chunked DATA section into blocks that end between values.
+
+    Args:
+        data_chunks (iterable of str): data section, piece by piece
+
+    Yields:
+        block (str): consecutive text holding only whole values
+
+    """
+    carry = ''
+    for chunk in data_chunks:
+        text = carry + chunk
+        cut = max(text.rfind(' '), text.rfind('\n'), text.rfind('\t'), text.rfind('\r'))
+        carry = text[cut + 1:]
+        if cut >= 0:
+            yield text[:cut + 1]
+    if carry:
+        yield carry
+
+
+def parse_numeric_block(block, null_values, sd_values, sentinels):
+    """Parse a block of DATA values into floats with numpy, in bulk.
+
+       Quoted values are classified once per distinct value and substituted
+       in the text by inf (null), -inf (statistical disclosure) or nan, so
+       that numpy.fromstring parses the whole block without creating a
+       Python string per value. Blocks with unquoted inf or nan, which would
+       be taken for those sentinels, or with anything else that numpy cannot
+       read are tokenized and converted by numeric_data_values() instead.
+
+    Args:
+        block (str): whole DATA values separated by blanks
+        null_values(str): regex with the pattern for the null values in the px
+                          file.
+        sd_values(str): regex with the pattern for the statistical disclosured
+                        values in the px file.
+        sentinels (dict): cache of quoted value -> substitute, shared between
+                          blocks
+
+    Returns:
+        data (numpy array): float64 values, NaN for null and sd cells.
+        null_mask (numpy array): True for null cells.
+        sd_mask (numpy array): True for statistical disclosure cells.
+
+    """
+    from pandas import Series  # pylint: disable=import-outside-toplevel
+
+    if SENTINEL_LETTERS.search(block) and \
+            SENTINEL_LETTERS.search(QUOTED_VALUE.sub(' ', block)):
+        return numeric_data_values(Series(block.split()), null_values, sd_values)
+
+    text = block
+    quoted = QUOTED_VALUE.search(text)
+    while quoted:
+        value = quoted.group()
+        if value not in sentinels:
+            null_mask, sd_mask = classify_data_values([value], null_values, sd_values)
+            sentinels[value] = 'inf' if null_mask[0] else '-inf' if sd_mask[0] else 'nan'
+        text = text.replace(value, sentinels[value])
+        quoted = QUOTED_VALUE.search(text, quoted.start())
+
+    if not text.strip():
+        # numpy reads blank text as [-1.]
+        empty = asarray([], dtype='float64')
+        return empty, empty.astype(bool), empty.astype(bool)
+    try:
+        with warnings.catch_warnings():
+            # older numpy warns and truncates instead of raising
+            warnings.simplefilter('error', DeprecationWarning)
+            data = fromstring(text, dtype='float64', sep=' ')
+    except (ValueError, DeprecationWarning):
+        return numeric_data_values(Series(block.split()), null_values, sd_values)
+
+    null_mask = data == inf
+    sd_mask = data == -inf
+    data[isinf(data)] = nan
+    return data, null_mask, sd_mask
+
+
+def parse_numeric_data(data, null_values, sd_values, decimals=None):
+    """Parse the DATA section into floats plus null and disclosure flags.
+
+    Args:
+        data (str or iterable of str): data section, whole or piece by piece
+        null_values(str): regex with the pattern for the null values in the px
+                          file.
+        sd_values(str): regex with the pattern for the statistical disclosured
+                        values in the px file.
+        decimals(int): number of decimals to round the values to; by default
+                       they are kept as written in the file. Optional
+    Returns:
+        data (numpy array): float64 values, NaN for null and sd cells.
+        null_mask (numpy array): True for null cells.
+        sd_mask (numpy array): True for statistical disclosure cells.
+
+    """
+    data_chunks = data
+    if isinstance(data, str):
+        data_chunks = (data[i:i + DATA_BLOCK_SIZE]
+                       for i in range(0, len(data), DATA_BLOCK_SIZE))
+    sentinels = {}
+    parsed = [parse_numeric_block(block, null_values, sd_values, sentinels)
+              for block in iter_data_blocks(data_chunks)]
+    if not parsed:
+        parsed = [parse_numeric_block('', null_values, sd_values, sentinels)]
+    values, null_mask, sd_mask = (concatenate(arrays) for arrays in zip(*parsed))
+    if decimals is not None:
+        round_(values, int(decimals), out=values)
+    return values, null_mask, sd_mask
+
+
+def get_decimals(metadata):
+    """Read the number of decimals of the cells from metadata dictionary.
+
+    Args:
+        metadata: dictionary of metadata
+
+    Returns:
+        decimals (int): value of DECIMALS, or None if absent or invalid
+
+    """
+    decimals = metadata.get('DECIMALS')
+    if isinstance(decimals, list):
+        decimals = decimals[0] if decimals else None
+    try:
+        return int(decimals)
+    except (TypeError, ValueError):
+        return None
+
+
+def build_dataframe_slice(dimension_names, dimension_members, data_values,
+                          null_values, sd_values, start=0, categorical=False):
+    """Build a dataframe for a contiguous slice of rows of the cube.
+
+    Args:
+        dimension_names (list of string)
+        dimension_members (list of string)
+        data_values(Series): pandas series with the data values of the slice.
+        null_values(str): regex with the pattern for the null values in the px
+                          file.
+        sd_values(str): regex with the pattern for the statistical disclosured
+                        values in the px file.
+        start (int): position of the first value of the slice in the cube.
+        categorical (bool): emit categorical dimension columns; optional
+    Returns:
+        df (pandas dataframe)
+
+    """
+    d_f = dimension_columns(dimension_names, dimension_members,
+                            start, start + len(data_values), categorical)
+    d_f['DATA'] = mask_data_values(data_values, null_values, sd_values)
+    return d_f
+
+
 def build_dataframe(dimension_names, dimension_members, data_values,
-                    null_values, sd_values):
+                    null_values, sd_values, categorical=False):
     """Build a dataframe from dimensions and data.
 
        Adds the cartesian product of dimension members plus the series of data.
+       Dimension columns are built with vectorized integer arithmetic, with no
+       per-row Python tuples.
 
     Args:
         dimension_names (list of string)
@@ -102,22 +672,16 @@ def build_dataframe(dimension_names, dimension_members, data_values,
                           file. Defaults to '.'.
         sd_values(str): regex with the pattern for the statistical disclosured
                         values in the px file. Defaults to '..'.
+        categorical (bool): emit pandas.Categorical dimension columns whose
+                            categories follow the VALUES order; optional
     Returns:
         df (pandas dataframe)
 
     """
-    # cartesian product of dimension members
-    dim_exploded = list(itertools.product(*dimension_members))
-
-    # Create DataFrame from the exploded dimensions
-    d_f = DataFrame(data=dim_exploded, columns=dimension_names)
-
-    # Create a boolean mask for null and statistical disclosure values
-    null_mask = data_values.str.match(null_values)
-    sd_mask = data_values.str.match(sd_values)
+    # cartesian product of dimension members, computed from integer codes
+    d_f = dimension_columns(dimension_names, dimension_members,
+                            categorical=categorical)
 
-    # Use np.where for efficient conditional assignment
-    d_f['DATA'] = where(null_mask, '', data_values)
-    d_f['DATA'] = where(sd_mask, nan, d_f['DATA'])
+    d_f['DATA'] = mask_data_values(data_values, null_values, sd_values)
 
     return d_f
@@ -3,6 +3,7 @@
 This module contains all the necessary helper functions for processing the textual content 
 of the PX file and its metadata. 
 """
+import functools
 import re
 
 def split_ignore_quotation_marks(string_input, separator, final=False):
@@ -16,43 +17,50 @@ def split_ignore_quotation_marks(string_input, separator, final=False):
     Return:
         list: ['text1', 'text2', ...]
     """
-    quotation_mark_start = False
     result = []
     index_from = 0
-    index = 0
+    position = 0
+    unquoted_run = unquoted_run_pattern(separator)
 
-    for index, element in enumerate(string_input):
-        if element == '"' and not quotation_mark_start:
-            quotation_mark_start = True
-        elif element == '"' and quotation_mark_start:
-            quotation_mark_start = False
-        if element == separator and not quotation_mark_start:
-            result.append(string_input[index_from:index])
-            index_from = index + 1
+    # each match skips, in C, everything up to the next separator that is
+    # not between quotation marks, instead of walking one character at a time
+    while True:
+        position = unquoted_run.match(string_input, position).end()
+        if position == len(string_input) or string_input[position] == '"':
+            # end of string, or a quotation mark that is never closed
+            break
+        result.append(string_input[index_from:position])
+        index_from = position = position + 1
     if len(result) > 0:
         if final:
             return result
-        result.append(string_input[index_from:index+1])
+        result.append(string_input[index_from:])
         return result
     return string_input
 
 
+@functools.lru_cache(maxsize=None)
+def unquoted_run_pattern(separator):
+    """Compile a regex matching text up to a separator outside quotation marks.
+
+    Args:
+        separator (string): single character
+    Return:
+        re.Pattern: pattern whose match ends right before the separator
+    """
+    unquoted = '[^"' + re.escape(separator) + ']*'
+    return re.compile(unquoted + '(?:"[^"]*"' + unquoted + ')*')
+
+
 def make_unique_list(list_duplicates):
     """Make a list from another list composed of unique elements
     Args:
         list_duplicates (list): list of elements with potential duplicates
     Returns:
-        list: list of unique elements
+        list: list of unique elements, in order of first appearance
     """
- # Small helper function to get unique elements of a list
-    # initialize a null list
-    unique_list = []
-
-    for element in list_duplicates:
-        # check if exists in unique_list or not
-        if element not in unique_list:
-            unique_list.append(element)
-    return unique_list
+    # dict keys are unique and keep insertion order
+    return list(dict.fromkeys(list_duplicates))
 
 
 def brackets_stripper(expression):
@@ -65,3 +73,50 @@ def brackets_stripper(expression):
     pattern = r'\[.*?\]'
     expression = re.sub(pattern, '', expression)
     return expression
+
+
+def join_text(values):
+    """Join the quoted parts of a metadata value into a single text
+    Args:
+        values (list or str): metadata value, as parsed
+    Returns:
+        str: parts separated by a blank, which the parser strips from them
+    """
+    if isinstance(values, str):
+        return values
+    return ' '.join(values)
+
+
+def regex_literal(pattern):
+    """Reduce a regular expression to the literal string it matches, if any.
+
+       Only patterns made of plain or escaped characters, optionally anchored
+       with ^ and $, are reduced; anything else returns None.
+
+    Args:
+        pattern (str): regular expression, as used with re.match
+    Returns:
+        tuple: (literal, exact) where exact tells if the whole string must be
+        equal to literal (pattern ends with $) or just start with it.
+        None if the pattern is not a literal.
+    """
+    if pattern.startswith('^'):
+        pattern = pattern[1:]
+    exact = pattern.endswith('$') and not pattern.endswith('\\$')
+    if exact:
+        pattern = pattern[:-1]
+    literal = []
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if char == '\\':
+            index += 1
+            if index == len(pattern) or pattern[index].isalnum():
+                return None
+            literal.append(pattern[index])
+        elif char in '.^$*+?{}[]|()':
+            return None
+        else:
+            literal.append(char)
+        index += 1
+    return ''.join(literal), exact
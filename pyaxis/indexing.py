@@ -0,0 +1,333 @@
+"""Indexing: random access to the cells of a local PX file.
+
+This module scans the DATA section of a PX file once, records the byte
+offset of every Nth row of the cube and persists those offsets next to the
+file. Later lookups memory-map the file and decode only the bytes of the
+rows that hold the requested cells.
+
+Example:
+    from pyaxis import indexing
+
+    index = indexing.open_index('census.px', encoding='ISO-8859-15')
+    value = index.cell({'Year': '2023', 'Region': 'Cantabria', 'Sex': 'Total'})
+    d_f = index.slice({'Year': ['2022', '2023']}, numeric=True)
+"""
+
+import json
+import mmap
+import os
+
+from numpy import arange, concatenate, flatnonzero, frombuffer, load, prod, \
+    savez, searchsorted, uint8, zeros
+
+from pyaxis.data_processing import dimension_columns, get_dimensions, \
+    mask_data_values, numeric_data_values, selection_offsets
+from pyaxis.pyaxis import parse_metadata
+
+# suffix of the index file written next to the PX file
+INDEX_SUFFIX = '.pxi.npz'
+# bytes of the DATA section scanned at a time while building the index
+SCAN_BLOCK_SIZE = 1 << 24
+
+# bytes that separate DATA values, including the final semicolon
+SEPARATORS = zeros(256, dtype=bool)
+SEPARATORS[list(b' \t\r\n;')] = True
+
+
+def find_data_start(buffer):
+    """Find the byte offset of the first DATA value of a PX file.
+
+    Args:
+        buffer (mmap or bytes): contents of the PX file
+
+    Returns:
+        data_start (int): offset right after the DATA= keyword
+
+    """
+    index = buffer.find(b'DATA=')
+    while index >= 0:
+        # skip occurrences between quotation marks
+        if buffer[:index].count(b'"') % 2 == 0:
+            return index + len(b'DATA=')
+        index = buffer.find(b'DATA=', index + 1)
+    raise ValueError('DATA keyword not found in pc-axis contents')
+
+
+def scan_value_offsets(buffer, data_start, stride):
+    """Record the byte offset of every stride-th value of the DATA section.
+
+    Args:
+        buffer (mmap or bytes): contents of the PX file
+        data_start (int): offset of the DATA section
+        stride (int): number of values between recorded offsets
+
+    Returns:
+        offsets (numpy array): byte offsets of values 0, stride, 2*stride...
+        count (int): total number of values
+
+    """
+    offsets = []
+    count = 0
+    previous_separator = True
+    for block_start in range(data_start, len(buffer), SCAN_BLOCK_SIZE):
+        block = frombuffer(buffer, dtype=uint8,
+                           count=min(SCAN_BLOCK_SIZE, len(buffer) - block_start),
+                           offset=block_start)
+        separator = SEPARATORS[block]
+        preceded = concatenate(([previous_separator], separator[:-1]))
+        starts = flatnonzero(~separator & preceded)
+        # values of this block whose global position is a multiple of stride
+        first = -count % stride
+        offsets.append(block_start + starts[first::stride])
+        count += len(starts)
+        previous_separator = separator[-1]
+    if not offsets:
+        return arange(0), 0
+    return concatenate(offsets), count
+
+
+def index_path(uri):
+    """Path of the index file of a PX file."""
+    return uri + INDEX_SUFFIX
+
+
+class DataIndex:
+    """Byte-offset index over the DATA section of a local PX file.
+
+    Attributes:
+        uri (str): PX file name
+        encoding (str): charset encoding
+        lang (str): language requested when indexing, or None for the default
+        metadata (dict): dictionary of metadata, in the indexed language
+        dimension_names (list of string)
+        dimension_members (list of string)
+        row_length (int): values per row, i.e. cells of all HEADING combinations
+        every (int): rows between recorded offsets
+        offsets (numpy array): byte offset of the first value of every
+                               every-th row
+        size (int): size of the PX file when indexed
+        mtime (float): modification time of the PX file when indexed
+
+    """
+
+    def __init__(self, uri, encoding, lang, metadata, row_length, every, offsets,
+                 size, mtime):
+        self.uri = uri
+        self.encoding = encoding
+        self.lang = lang
+        self.metadata = metadata
+        self.dimension_names, self.dimension_members = get_dimensions(metadata)
+        self.row_length = row_length
+        self.every = every
+        self.offsets = offsets
+        self.size = size
+        self.mtime = mtime
+        self._file = None
+        self._buffer = None
+
+    @property
+    def stride(self):
+        """Number of values between two recorded offsets."""
+        return self.row_length * self.every
+
+    def is_fresh(self):
+        """Tell if the PX file is unchanged since it was indexed."""
+        stat = os.stat(self.uri)
+        return stat.st_size == self.size and stat.st_mtime == self.mtime
+
+    def save(self, path=None):
+        """Persist the index, next to the PX file by default.
+
+        Args:
+            path (str): index file name; optional
+
+        """
+        header = {
+            'uri': self.uri, 'encoding': self.encoding, 'lang': self.lang,
+            'metadata': self.metadata,
+            'row_length': self.row_length, 'every': self.every,
+            'size': self.size, 'mtime': self.mtime
+        }
+        with open(path or index_path(self.uri), 'wb') as file_object:
+            savez(file_object, offsets=self.offsets, header=json.dumps(header))
+
+    def buffer(self):
+        """Memory-map the PX file on first use."""
+        if self._buffer is None:
+            self._file = open(self.uri, 'rb')
+            self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._buffer
+
+    def close(self):
+        """Release the memory map of the PX file."""
+        if self._buffer is not None:
+            self._buffer.close()
+            self._file.close()
+            self._buffer = self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def values_at(self, positions):
+        """Decode the raw values at the given positions of the DATA section.
+
+        Args:
+            positions (numpy array): sorted positions of the values
+
+        Returns:
+            values (list of string): values as written in the file
+
+        """
+        buffer = self.buffer()
+        values = []
+        anchors = positions // self.stride
+        first = 0
+        while first < len(positions):
+            anchor = int(anchors[first])
+            last = int(searchsorted(anchors, anchor, side='right'))
+            start = int(self.offsets[anchor])
+            if anchor + 1 < len(self.offsets):
+                stop = int(self.offsets[anchor + 1])
+            else:
+                stop = len(buffer)
+            # only the rows between two recorded offsets are decoded
+            tokens = buffer[start:stop].replace(b';', b' ').split()
+            for position in (positions[first:last] - anchor * self.stride).tolist():
+                values.append(tokens[position].decode(self.encoding))
+            first = last
+        return values
+
+    def slice(self, select=None, null_values=r'^"\."$', sd_values=r'"\.\."',
+              numeric=False, categorical=False):
+        """Read a selection of cells into a dataframe.
+
+        Args:
+            select (dict): {dimension name: member or list of members};
+                           dimensions left out keep all their members
+            null_values(str): regex with the pattern for the null values.
+            sd_values(str): regex with the pattern for the statistical
+                            disclosured values.
+            numeric (bool): DATA column as float64 with NaN for null and sd
+                            cells, as in parse(numeric=True); optional
+            categorical (bool): dimension columns as pandas.Categorical;
+                                optional
+
+        Returns:
+            d_f (pandas dataframe): same layout as parse() with select
+
+        """
+        from pandas import Series  # pylint: disable=import-outside-toplevel
+
+        positions, members = selection_offsets(
+            self.dimension_names, self.dimension_members, select or {})
+        data_values = Series(self.values_at(positions), dtype=object)
+        d_f = dimension_columns(self.dimension_names, members,
+                                categorical=categorical)
+        if numeric:
+            d_f['DATA'] = numeric_data_values(data_values, null_values, sd_values)[0]
+        else:
+            d_f['DATA'] = mask_data_values(data_values, null_values, sd_values)
+        return d_f
+
+    def cell(self, coords=None, null_values=r'^"\."$', sd_values=r'"\.\."',
+             numeric=False, **kwargs):
+        """Read a single cell.
+
+        Args:
+            coords (dict): {dimension name: member} for every dimension;
+                           keyword arguments are accepted too
+            null_values(str): regex with the pattern for the null values.
+            sd_values(str): regex with the pattern for the statistical
+                            disclosured values.
+            numeric (bool): return a float, NaN for null and sd cells; optional
+
+        Returns:
+            value (str or float): DATA value of the cell
+
+        """
+        coords = dict(coords or {}, **kwargs)
+        missing = set(self.dimension_names) - set(coords)
+        if missing:
+            raise ValueError('Missing dimensions: ' + ', '.join(sorted(missing)))
+        return self.slice(coords, null_values, sd_values, numeric)['DATA'].iloc[0]
+
+
+def build_index(uri, encoding, lang=None, every=1):
+    """Scan a local PX file and index the byte offset of every Nth row.
+
+    Args:
+        uri (str): PX file name
+        encoding (str): charset encoding; must be ASCII compatible
+        lang: language of the metadata and dimension names; optional
+        every (int): rows between recorded offsets; larger values make the
+                     index smaller and lookups decode more bytes. Optional
+
+    Returns:
+        index (DataIndex)
+
+    """
+    if every < 1:
+        raise ValueError('every must be a positive integer')
+    metadata = parse_metadata(uri, encoding, lang=lang)['METADATA']
+    dimension_names, dimension_members = get_dimensions(metadata)
+    sizes = [len(members) for members in dimension_members]
+    heading_count = len(metadata.get('HEADING', []))
+    row_length = int(prod(sizes[len(sizes) - heading_count:], dtype='int64')) or 1
+
+    stat = os.stat(uri)
+    with open(uri, 'rb') as file_object:
+        with mmap.mmap(file_object.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            data_start = find_data_start(buffer)
+            offsets, count = scan_value_offsets(buffer, data_start, row_length * every)
+    expected = int(prod(sizes, dtype='int64'))
+    if count != expected:
+        raise ValueError('DATA holds ' + str(count) + ' values, ' +
+                         str(expected) + ' expected from STUB and HEADING')
+    return DataIndex(uri, encoding, lang, metadata, row_length, every, offsets,
+                     stat.st_size, stat.st_mtime)
+
+
+def load_index(uri, path=None):
+    """Load a persisted index.
+
+    Args:
+        uri (str): PX file name
+        path (str): index file name; defaults to the one next to the PX file
+
+    Returns:
+        index (DataIndex)
+
+    """
+    with load(path or index_path(uri), allow_pickle=False) as stored:
+        header = json.loads(str(stored['header']))
+        offsets = stored['offsets']
+    return DataIndex(uri, header['encoding'], header['lang'], header['metadata'],
+                     header['row_length'], header['every'], offsets,
+                     header['size'], header['mtime'])
+
+
+def open_index(uri, encoding, lang=None, every=1, path=None):
+    """Load the index of a PX file, building and saving it if missing or stale.
+
+    Args:
+        uri (str): PX file name
+        encoding (str): charset encoding
+        lang: language of the metadata and dimension names; optional
+        every (int): rows between recorded offsets; optional
+        path (str): index file name; defaults to the one next to the PX file
+
+    Returns:
+        index (DataIndex)
+
+    """
+    if os.path.exists(path or index_path(uri)):
+        index = load_index(uri, path)
+        if (index.is_fresh() and index.encoding == encoding and index.lang == lang
+                and index.every == every):
+            return index
+    index = build_index(uri, encoding, lang, every)
+    index.save(path)
+    return index
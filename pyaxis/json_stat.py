@@ -14,11 +14,38 @@ Example:
     file = open('2184.json-stat', 'w')
     file.write(json_str)
     file.close()
+
+json_stat_dict() and dump_json_stat() build the same dataset straight from
+the metadata and the DATA column, in the order of the PX file, which is
+already the row-major order of the JSON-Stat value array:
+
+    with open('2184.json-stat', 'w') as file:
+        json_stat.dump_json_stat(px, file)
+
+stream_json_stat() goes straight from a PX file or URL to a writable
+stream, writing the dimensions first and then the values as the DATA
+section is parsed, without a DataFrame nor the whole JSON object in memory:
+
+    with open('2184.json-stat', 'w') as file:
+        json_stat.stream_json_stat(EXAMPLE_URL, file, encoding='ISO-8859-2')
 """
 
 import json
+import shutil
+import tempfile
 
-from pyjstat import pyjstat
+from numpy import asarray, flatnonzero, isnan, prod, trunc
+
+from pyaxis.data_processing import get_decimals, get_dimensions, iter_data_blocks, \
+    parse_numeric_block
+from pyaxis.helpers_string import join_text
+from pyaxis.metadata_processing import metadata_extract_stream, \
+    metadata_split_to_dict, multilingual_parse
+from pyaxis.pyaxis import CHUNK_SIZE, read_chunks
+
+# status of null and statistical disclosure cells, as marked in PX files
+NULL_STATUS = '.'
+SD_STATUS = '..'
 
 
 def to_json_stat(p_x):
@@ -30,6 +57,8 @@ def to_json_stat(p_x):
     Returns:
         json_obj (json): 
     """
+    from pyjstat import pyjstat  # pylint: disable=import-outside-toplevel
+
     meta_keys = {
         'label': 'TITLE',
         'note': 'NOTE',
@@ -68,3 +97,204 @@ def to_json_stat(p_x):
         pass
 
     return json_obj
+
+
+def json_stat_values(p_x):
+    """Get the value array and status of a parsed px object.
+
+    Args:
+        p_x (dict): parsed px object, with DATA as strings or numeric
+
+    Returns:
+        values (list): cell values, None for null and sd cells
+        status (dict): position -> NULL_STATUS or SD_STATUS, only for those cells
+
+    """
+    data = p_x['DATA']['DATA']
+    if 'FLAGS' in p_x:
+        null_mask = asarray(p_x['FLAGS']['NULL'])
+        sd_mask = asarray(p_x['FLAGS']['SD'])
+    else:
+        # build_dataframe() masks null cells as '' and sd cells as NaN
+        null_mask = (data == '').values
+        sd_mask = data.isna().values
+    values = data.astype(object).values
+    values[data.isna().values | null_mask] = None
+    status = {}
+    for position in null_mask.nonzero()[0].tolist():
+        status[str(position)] = NULL_STATUS
+    for position in sd_mask.nonzero()[0].tolist():
+        status[str(position)] = SD_STATUS
+    return values.tolist(), status
+
+
+def json_stat_header(metadata):
+    """Build a JSON-Stat dataset from metadata, without value nor status.
+
+    Args:
+        metadata (dict): dictionary of metadata
+
+    Returns:
+        json_obj (dict): dataset with a dimension per STUB and HEADING
+                         variable plus the 'Variables' metric of to_json_stat()
+
+    """
+    dimension_names, dimension_members = get_dimensions(metadata)
+    json_obj = {'version': '2.0', 'class': 'dataset'}
+    if 'TITLE' in metadata:
+        json_obj['label'] = join_text(metadata['TITLE'])
+    if 'SOURCE' in metadata:
+        json_obj['source'] = join_text(metadata['SOURCE'])
+    if 'NOTE' in metadata:
+        json_obj['note'] = metadata['NOTE']
+    json_obj['id'] = dimension_names + ['Variables']
+    json_obj['size'] = [len(members) for members in dimension_members] + [1]
+    json_obj['role'] = {'metric': ['Variables']}
+
+    dimensions = {}
+    for name, members in zip(dimension_names, dimension_members):
+        dimensions[name] = {
+            'label': name,
+            'category': {
+                'index': {member: position for position, member in enumerate(members)},
+                'label': {member: member for member in members}
+            }
+        }
+    variables = {'index': {'DATA': 0}, 'label': {'DATA': 'DATA'}}
+    if 'UNITS' in metadata:
+        variables['unit'] = {'DATA': {'decimals': get_decimals(metadata),
+                                      'label': join_text(metadata['UNITS'])}}
+    dimensions['Variables'] = {'label': 'Variables', 'category': variables}
+    json_obj['dimension'] = dimensions
+    return json_obj
+
+
+def json_stat_dict(p_x):
+    """Converts a parsed px object to a JSON-Stat dataset, without pyjstat.
+
+    Args:
+        p_x (dict): parsed px object, whole cube
+
+    Returns:
+        json_obj (dict): JSON-Stat dataset, values in the order of the px file
+    """
+    json_obj = json_stat_header(p_x['METADATA'])
+    cells = int(prod(json_obj['size'], dtype='int64'))
+    if len(p_x['DATA']) != cells:
+        raise ValueError('DATA holds ' + str(len(p_x['DATA'])) + ' cells, ' +
+                         str(cells) + ' expected from STUB and HEADING')
+    json_obj['value'], status = json_stat_values(p_x)
+    if status:
+        json_obj['status'] = status
+    return json_obj
+
+
+def dump_json_stat(p_x, file_object):
+    """Writes a parsed px object as JSON-Stat to a text file object.
+
+    Args:
+        p_x (dict): parsed px object, whole cube
+        file_object: writable text stream
+    """
+    json.dump(json_stat_dict(p_x), file_object, ensure_ascii=False)
+
+
+def json_number_list(data, decimals=None):
+    """Format float values as a JSON array body, null for NaN.
+
+    Args:
+        data (numpy array): float64 values
+        decimals(int): number of decimals; with 0, integral values are
+                       written without a fractional part. Optional
+
+    Returns:
+        text (str): comma-separated values, without brackets
+    """
+    missing = isnan(data)
+    values = data.astype(object)
+    if decimals == 0:
+        integral = ~missing & (data == trunc(data))
+        values[integral] = data[integral].astype('int64').tolist()
+    values[missing] = None
+    return json.dumps(values.tolist())[1:-1]
+
+
+def stream_json_stat(uri, file_object, encoding, timeout=10, verify=True,
+                     null_values=r'^"\."$', sd_values=r'"\.\."',
+                     lang=None, headers=None, chunk_size=CHUNK_SIZE,
+                     session=None, response_cache=None):
+    """Writes a px file or URL as JSON-Stat while it is parsed.
+
+    Args:
+        uri (str): file name or URL
+        file_object: writable text stream
+        encoding (str): charset encoding
+        timeout (int): request timeout in seconds; optional
+        verify (bool, str): verify server TLS certificate or not, or path to cert file; optional
+        null_values(str): regex with the pattern for the null values in the px
+                          file. Defaults to '.'.
+        sd_values(str): regex with the pattern for the statistical disclosured
+                        values in the px file. Defaults to '..'.
+        lang: language desired for the metadata and the dimension ids; optional
+        headers (str): HTTP headers; optional
+        chunk_size (int): number of characters read per step; optional
+        session (requests.Session): session to download with; optional
+        response_cache (pyaxis.cache.ResponseCache): local copy of downloaded
+                                                     files; optional
+
+    Returns:
+        cells (int): number of values written
+
+    Raises:
+        ValueError: if the DATA section does not hold as many cells as the
+                    STUB and HEADING variables give. It is raised before the
+                    value array is closed, so file_object then holds an
+                    incomplete document.
+    """
+    chunks = read_chunks(uri, encoding, timeout, verify, headers, chunk_size,
+                         session, response_cache)
+    metadata_elements, data_chunks = metadata_extract_stream(chunks)
+    metadata, _ = multilingual_parse(metadata_split_to_dict(metadata_elements), lang)
+    header = json_stat_header(metadata)
+    decimals = get_decimals(metadata)
+    expected = int(prod(header['size'], dtype='int64'))
+
+    # the dimensions are sent before any value is parsed
+    file_object.write(json.dumps(header, ensure_ascii=False)[:-1] + ', "value": [')
+    cells = 0
+    # flagged positions are spilled to disk, already formatted, so memory
+    # does not grow with the number of null or sd cells
+    with tempfile.TemporaryFile('w+', encoding='utf-8') as null_file, \
+            tempfile.TemporaryFile('w+', encoding='utf-8') as sd_file:
+        sentinels = {}
+        for block in iter_data_blocks(data_chunks):
+            data, null_mask, sd_mask = parse_numeric_block(
+                block, null_values, sd_values, sentinels)
+            if not len(data):
+                continue
+            file_object.write((', ' if cells else '') + json_number_list(data, decimals))
+            for status, mask, status_file in ((NULL_STATUS, null_mask, null_file),
+                                              (SD_STATUS, sd_mask, sd_file)):
+                status_file.write(''.join(
+                    ', "' + str(position) + '": "' + status + '"'
+                    for position in (cells + flatnonzero(mask)).tolist()))
+            cells += len(data)
+        if cells != expected:
+            raise ValueError('DATA holds ' + str(cells) + ' cells, ' +
+                             str(expected) + ' expected from STUB and HEADING')
+        file_object.write(']')
+
+        # JSON object keys are unordered: null positions go before sd ones
+        status_files = [status_file for status_file in (null_file, sd_file)
+                        if status_file.tell()]
+        if status_files:
+            file_object.write(', "status": {')
+            for position, status_file in enumerate(status_files):
+                status_file.seek(0)
+                if position == 0:
+                    # separator before the first entry
+                    status_file.read(2)
+                shutil.copyfileobj(status_file, file_object)
+            file_object.write('}')
+    file_object.write('}')
+    return cells
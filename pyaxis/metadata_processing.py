@@ -6,8 +6,47 @@ format it, and handle a language choice if the metadata is multilingual.
 
 import logging
 import re
+from collections import namedtuple
+
 from pyaxis.helpers_string import brackets_stripper, make_unique_list, split_ignore_quotation_marks
 
+logger = logging.getLogger(__name__)
+
+# KEYWORD[lang]("subkey", ...)=values; with semicolons and equal signs allowed
+# between quotation marks
+METADATA_ELEMENT = re.compile(
+    r'[\s;]*(?P<name>[^"=;]*(?:"[^"]*"[^"=;]*)*)=(?P<values>[^";]*(?:"[^"]*"[^";]*)*);')
+METADATA_NAME = re.compile(
+    r'\s*(?P<keyword>[^\[(]*?)\s*(?:\[(?P<language>[^\]]*)\])?\s*'
+    r'(?:\((?P<subkeys>.*)\))?\s*$', re.DOTALL)
+QUOTED_VALUES = re.compile('"[ ]*(.+?)[ ]*"+?')
+UNQUOTED_VALUES = re.compile('^[^"]*$')
+
+MetadataToken = namedtuple(
+    'MetadataToken', ['name', 'keyword', 'language', 'subkeys', 'values'])
+MetadataToken.__doc__ = """Metadata element of a PX file.
+
+    name (str): key of the element in the metadata dictionary,
+                e.g. 'VALUES[fr](Sexe)'
+    keyword (str): e.g. 'VALUES'
+    language (str): language between brackets, or None
+    subkeys (tuple of str): values between parentheses, e.g. ('Sexe',)
+    values (list of str or str): quoted values, or the raw text if unquoted
+"""
+
+
+class MetadataElements(list):
+    """List of ATTRIBUTE=VALUES elements, with the tokens they were scanned into.
+
+    metadata_split_to_dict() builds its dict from the tokens, so the metadata
+    section is tokenized once, when it is split.
+    """
+
+    def __init__(self, elements, tokens):
+        super().__init__(elements)
+        self.tokens = tokens
+
+
 def metadata_extract(pc_axis):
     r"""Extract metadata and data from pc-axis file contents.
 
@@ -25,22 +64,210 @@ def metadata_extract(pc_axis):
 
     # split file into metadata and data sections
     metadata, data = pc_axis.split('DATA=')
-    # meta: list of strings that conforms to pattern ATTRIBUTE=VALUES
-    metadata_attributes = split_ignore_quotation_marks(metadata,
-                                                       ';', final=True)
-    # metadata_attributes = re.findall('([^=]+=[^=]+)(?:;|$)', metadata)
+    metadata_attributes = metadata_attributes_split(metadata)
 
     # remove all semicolons
     data = data.replace(';', '')
     # remove trailing blanks
     data = data.strip()
 
-    for i, item in enumerate(metadata_attributes):
-        metadata_attributes[i] = item.strip().rstrip(';')
-
     return metadata_attributes, data
 
 
+def metadata_extract_stream(chunks):
+    r"""Extract metadata and data from an iterable of pc-axis text chunks.
+
+       Chunks are accumulated only until the DATA= keyword is found; the
+       data section is handed back as a lazy iterator over the remaining
+       chunks, so it is never materialized as a single string.
+
+    Args:
+        chunks (iterable of str): pc_axis file contents, piece by piece.
+
+    Returns:
+        metadata_attributes (list of string): each item conforms to an\
+                                              ATTRIBUTE=VALUES pattern.
+        data_chunks (iterator of str): data values, piece by piece, without
+                                       semicolons.
+
+    """
+    chunks = iter(chunks)
+    header = ''
+    data_start = -1
+    search_from = 0
+    for chunk in chunks:
+        header += chunk
+        data_start = _find_data_keyword(header, search_from)
+        if data_start >= 0:
+            break
+        # the keyword may straddle two chunks
+        search_from = max(len(header) - len('DATA='), 0)
+    if data_start < 0:
+        raise ValueError('DATA keyword not found in pc-axis contents')
+
+    metadata = header[:data_start].replace('\n', ' ').replace('\r', ' ')
+    metadata_attributes = metadata_attributes_split(metadata)
+    first_data = header[data_start + len('DATA='):]
+
+    def data_chunks():
+        try:
+            if first_data:
+                yield first_data.replace(';', '')
+            for chunk in chunks:
+                yield chunk.replace(';', '')
+        finally:
+            # closing the data section early releases the file or response
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+    return metadata_attributes, data_chunks()
+
+
+def _find_data_keyword(text, start):
+    """Return the index of the first DATA= outside quotation marks, or -1."""
+    index = text.find('DATA=', start)
+    while index >= 0:
+        if text.count('"', 0, index) % 2 == 0:
+            return index
+        index = text.find('DATA=', index + 1)
+    return -1
+
+
+def metadata_attributes_split(metadata):
+    """Split the metadata section into a list of ATTRIBUTE=VALUES elements.
+
+    Args:
+        metadata (str): metadata section of the pc-axis file, without new lines.
+
+    Returns:
+        metadata_attributes (MetadataElements): pairs ATTRIBUTE=VALUES
+
+    """
+    return MetadataElements(*metadata_scan(metadata))
+
+
+def metadata_scan(metadata):
+    """Scan the metadata section into elements and their tokens in a single pass.
+
+       Elements the grammar does not match, such as those with unbalanced
+       quotation marks, are split and read one by one as before the scanner,
+       from there to the end of the section.
+
+    Args:
+        metadata (str): metadata section, a sequence of ATTRIBUTE=VALUES;
+
+    Returns:
+        metadata_attributes (list of string): pairs ATTRIBUTE=VALUES
+        tokens (list of MetadataToken): one per element, in file order
+
+    """
+    metadata_attributes = []
+    tokens = []
+    position = 0
+    end = len(metadata.rstrip())
+    while position < end:
+        element = METADATA_ELEMENT.match(metadata, position)
+        if element is None:
+            rest = split_ignore_quotation_marks(metadata[position:], ';', final=True)
+            if isinstance(rest, list):
+                for item in rest:
+                    item = item.strip()
+                    if item:
+                        metadata_attributes.append(item)
+                        tokens.append(element_token(item))
+            break
+        metadata_attributes.append(
+            metadata[element.start('name'):element.end('values')].strip())
+        tokens.append(metadata_token(element.group('name'), element.group('values')))
+        position = element.end()
+    return metadata_attributes, tokens
+
+
+def metadata_tokenize(metadata):
+    """Scan the metadata section into structured tokens in a single pass.
+
+    Args:
+        metadata (str): metadata section, a sequence of ATTRIBUTE=VALUES;
+
+    Returns:
+        tokens (list of MetadataToken): one per element, in file order
+
+    """
+    return metadata_scan(metadata)[1]
+
+
+def element_token(element):
+    """Make a MetadataToken from a single ATTRIBUTE=VALUES element.
+
+    Args:
+        element (str): e.g. 'VALUES[fr]("Sexe")="Hommes","Femmes"'
+
+    Returns:
+        token (MetadataToken)
+
+    """
+    parts = split_ignore_quotation_marks(element, '=', final=False)
+    if not isinstance(parts, list) or len(parts) != 2:
+        raise ValueError('Malformed metadata element: ' + element[:80])
+    return metadata_token(*parts)
+
+
+def metadata_token(raw_name, raw_values):
+    """Make a MetadataToken from the text at both sides of the equal sign.
+
+    Args:
+        raw_name (str): e.g. 'VALUES[fr]("Sexe")'
+        raw_values (str): e.g. '"Hommes","Femmes"'
+
+    Returns:
+        token (MetadataToken)
+
+    """
+    # avoid unexpected trailing blanks
+    name = raw_name.strip()
+    name = name.replace('"', '')
+    # remove leading and trailing blanks from element names
+    name = name.replace('( ', '(')
+    name = name.replace(' )', ')')
+
+    parts = METADATA_NAME.match(raw_name)
+    if parts is None:
+        # not KEYWORD[lang](subkeys): the whole name is the keyword
+        keyword, language, subkeys = name, None, None
+    else:
+        keyword, language = parts.group('keyword'), parts.group('language')
+        subkeys = parts.group('subkeys')
+    if subkeys is None:
+        subkeys = ()
+    elif '"' in subkeys:
+        subkeys = tuple(value.strip() for value in re.findall('"([^"]*)"', subkeys))
+    else:
+        subkeys = tuple(value.strip() for value in subkeys.split(','))
+
+    raw_values = raw_values.rstrip()
+    # check if 'values' is delimited by double quotes
+    if UNQUOTED_VALUES.match(raw_values):
+        values = raw_values
+    else:
+        # split values delimited by double quotes into list
+        # additionally strip leading and trailing blanks
+        values = QUOTED_VALUES.findall(raw_values)
+    return MetadataToken(name, keyword, language, subkeys, values)
+
+
+def metadata_tokens_to_dict(tokens):
+    """Make a multi-valued keys dict from metadata tokens.
+
+    Args:
+        tokens (list of MetadataToken)
+
+    Returns:
+        metadata (dictionary): {'attribute1': ['value1', 'value2', ... ], ...}
+
+    """
+    return {token.name: token.values for token in tokens}
+
+
 def metadata_split_to_dict(metadata_elements):
     """Split the list of metadata elements into a multi-valued keys dict.
 
@@ -51,26 +278,11 @@ def metadata_split_to_dict(metadata_elements):
         metadata (dictionary): {'attribute1': ['value1', 'value2', ... ], ...}
 
     """
-    metadata = {}
+    tokens = getattr(metadata_elements, 'tokens', None)
+    if tokens is None:
+        tokens = [element_token(element) for element in metadata_elements]
+    return metadata_tokens_to_dict(tokens)
 
-    for element in metadata_elements:
-        name, values = split_ignore_quotation_marks(element, '=', final=False)
-
-        # avoid unexpected trailing blanks
-        name = name.strip()
-        name = name.replace('"', '')
-        # remove leading and trailing blanks from element names
-        name = name.replace('( ', '(')
-        name = name.replace(' )', ')')
-        # check if 'values' is delimited by double quotes
-        pattern = re.compile('^[^"]*$')
-        if pattern.match(values):
-            metadata[name] = values
-        else:
-            # split values delimited by double quotes into list
-            # additionally strip leading and trailing blanks
-            metadata[name] = re.findall('"[ ]*(.+?)[ ]*"+?', values)
-    return metadata
 
 def multilingual_checker(metadata_dict):
     """ Check if the PX file is multilingual
@@ -82,7 +294,7 @@ def multilingual_checker(metadata_dict):
     """
     # CHECK MULTILINGUAL
     if 'LANGUAGES' in metadata_dict.keys():
-        print("Multilingual PX file")
+        logger.debug('Multilingual PX file')
         translation = True
         languages = metadata_dict["LANGUAGES"]
     else:
@@ -104,22 +316,45 @@ def language_presence_checker(languages, lang):
             'The language you are referring to is not present in the PX file. %s',
             _ExcInfoType=None)
 
-def get_default_lang(metadata_dict, languages):
+def metadata_key_index(metadata_dict):
+    """ Index the keys of the metadata by keyword, language and subkeys, in one pass
+    Args:
+        metadata_dict (dict): dictionary of metadata
+    Returns:
+        dict: key -> (keyword, language, subkeys), where language is None for
+        keys without brackets and subkeys is the text between parentheses or None
+    """
+    index = {}
+    for key in metadata_dict:
+        parts = METADATA_NAME.match(key)
+        if parts is None:
+            # not KEYWORD[lang](subkeys), as in metadata_token()
+            index[key] = (key, None, None)
+        else:
+            index[key] = (parts.group('keyword'), parts.group('language'),
+                          parts.group('subkeys'))
+    return index
+
+def get_default_lang(metadata_dict, languages, index=None):
     """ Get the default language metadata and the default field names of the metadata
     Args:
         metadata_dict (dict): dictionary of metadata
         languages (list): list of languages in the PX file
+        index (dict): metadata_key_index() of metadata_dict; optional
     Returns:
         tuple: (lang_dict, default_multilingual_fields)
         where lang_dict is a dictionary of the metadata in the default language
         and default_multilingual_fields is a list of metadata field names in the default language
     """
+    if index is None:
+        index = metadata_key_index(metadata_dict)
+    language_set = set(languages)
     lang_dict = {}
     default_multilingual_fields = []
     previous_key = None
     #just remove all the metadata for other languages
     for key, value in metadata_dict.items():
-        if any("["+l+"]" in key for l in languages):
+        if index[key][1] in language_set:
             default_multilingual_fields.append(previous_key)
         else:
             lang_dict[key] = value
@@ -128,19 +363,24 @@ def get_default_lang(metadata_dict, languages):
     default_multilingual_fields = make_unique_list(default_multilingual_fields)
     return(lang_dict, default_multilingual_fields)
 
-def metadata_dict_maker(metadata_dict, languages, lang):
+def metadata_dict_maker(metadata_dict, languages, lang, index=None):
     """Make a dictionary of metadata for the requested language
     Args:
         metadata_dict (dict): dictionary of metadata
         languages (list): list of languages in the PX file
         lang (str): language requested
+        index (dict): metadata_key_index() of metadata_dict; optional
     Returns:
         tuple: (lang_dict, default_multilingual_fields) 
         where lang_dict is a dictionary of the metadata in the requested language 
         and default_multilingual_fields is a list of metadata field names in the default language
     """
+    if index is None:
+        index = metadata_key_index(metadata_dict)
+    language_set = set(languages)
     # get the default lang_dict and the default field names
-    default_lang_dict, default_multilingual_fields = get_default_lang(metadata_dict, languages)
+    default_lang_dict, default_multilingual_fields = get_default_lang(
+        metadata_dict, languages, index)
     lang_dict = {}
     previous_key = None
     # Case: Language is not the default language
@@ -148,9 +388,9 @@ def metadata_dict_maker(metadata_dict, languages, lang):
         #for value, key in enumerate(metadata_dict):
         for key, value in metadata_dict.items():
             #check if multilingual key
-            if "["+lang+"]" in key:
+            if index[key][1] == lang:
                 # remove the default language that has just been added
-                if 'previous_key' in locals() and previous_key in lang_dict:
+                if previous_key in lang_dict:
                     del lang_dict[previous_key]
                 # remove language info from key
                 key = brackets_stripper(key)
@@ -158,7 +398,7 @@ def metadata_dict_maker(metadata_dict, languages, lang):
                 lang_dict[key] = value
             else:
                 # condition ensures we skip the keys tied to other languages
-                if not any("["+l+"]" in key for l in languages):
+                if index[key][1] not in language_set:
                     # add the key common to all languages
                     lang_dict[key] = value
                     #store the key in case it is the default language which will have to be removed
@@ -195,6 +435,8 @@ def translation_dict_maker(
     subset_languages = languages.copy()
     subset_languages.remove(default_language)
     list_all_keys = list(metadata_dict.keys())
+    # position of each key, as translations follow their default language key
+    key_positions = {key: position for position, key in enumerate(list_all_keys)}
     for default_key in default_multilingual_fields:
         field_dict = {}
         lang_keys = {}
@@ -202,7 +444,7 @@ def translation_dict_maker(
         field_dict[default_language] = metadata_dict[default_key]
         lang_keys[default_language] = default_key
         # Add each of the other languages
-        default_index = list_all_keys.index(default_key)
+        default_index = key_positions[default_key]
         starting_index = default_index + 1
         for i, language in enumerate(subset_languages):
             lang_key = list_all_keys[starting_index + i]
@@ -243,7 +485,10 @@ def multilingual_parse(metadata_dict, lang):
         # STEP 2 CHECK LANGUAGE IS AVAILABLE
         language_presence_checker(languages, lang)
         # STEP 3 DEFINE METADATA DICT CORRESPONDING TO LANGUAGE
-        lang_dict, default_multilingual_fields = metadata_dict_maker(metadata_dict, languages, lang)
+        # keys are indexed once by language for all the following steps
+        index = metadata_key_index(metadata_dict)
+        lang_dict, default_multilingual_fields = metadata_dict_maker(
+            metadata_dict, languages, lang, index)
         # STEP 4 MAKE TRANSLATION DICTIONARY
         translation_dict = translation_dict_maker(metadata_dict, default_multilingual_fields,
                                                   languages, default_language, lang)
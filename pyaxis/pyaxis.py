@@ -21,21 +21,31 @@ Example:
 
 """
 
+import codecs
+import concurrent.futures
 import logging
 import re
+import threading
 import traceback
 
-from pandas import Series
+from pyaxis.metadata_processing import metadata_extract, metadata_extract_stream, \
+    metadata_split_to_dict, multilingual_parse
 
-import requests
+from pyaxis.data_processing import get_dimensions, build_dataframe, \
+    build_dataframe_slice, dimension_columns, index_dimension_columns, iter_data_tokens, \
+    lookup_tables, member_codes, numeric_data_values, parse_numeric_data, \
+    read_data_tokens, relabel_dimension_columns, select_data_tokens, selection_offsets
 
-from pyaxis.metadata_processing import metadata_extract, metadata_split_to_dict, multilingual_parse
 
-from pyaxis.data_processing import get_dimensions, build_dataframe
+logger = logging.getLogger(__name__)
 
+# characters read per step by read_chunks() in streaming mode
+CHUNK_SIZE = 1 << 20
+# smaller steps for metadata-only parsing, which usually stops early
+METADATA_CHUNK_SIZE = 1 << 16
 
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+# keep-alive session of each thread, see get_session()
+_SESSIONS = threading.local()
 
 
 def uri_type(uri):
@@ -67,7 +77,101 @@ def uri_type(uri):
     return uri_type_result
 
 
-def read(uri, encoding, timeout=10, verify=True, headers=None):
+def get_session():
+    """Return the requests.Session of the current thread, created on first use.
+
+       Reusing the session keeps connections alive between downloads, so
+       each one does not pay a new TCP and TLS handshake. requests.Session
+       is not documented as thread-safe, so every thread, such as the
+       workers of parse_many(), gets its own.
+
+    Returns:
+        session (requests.Session)
+
+    """
+    session = getattr(_SESSIONS, 'session', None)
+    if session is None:
+        # requests is only imported when a URL is read
+        import requests  # pylint: disable=import-outside-toplevel
+        session = _SESSIONS.session = requests.Session()
+        # worker threads of parse_many() hand theirs back to be closed
+        owned = getattr(_SESSIONS, 'owned', None)
+        if owned is not None:
+            owned.append(session)
+    return session
+
+
+def _own_sessions(owned):
+    """Executor initializer: record the sessions this worker thread opens."""
+    _SESSIONS.owned = owned
+
+
+def _request(uri, timeout, verify, headers, session=None, response_cache=None):
+    """Issue a streamed GET request, logging and re-raising request errors."""
+    import requests  # pylint: disable=import-outside-toplevel
+    session = session or get_session()
+    request_headers = dict(headers or {})
+    if response_cache is not None:
+        # conditional GET: the server answers 304 if the cached body is current
+        request_headers.update(response_cache.conditional_headers(uri))
+    try:
+        if request_headers:
+            response = session.get(
+                uri, stream=True, timeout=timeout, verify=verify, headers=request_headers)
+        else:
+            response = session.get(uri, stream=True, timeout=timeout, verify=verify)
+        response.raise_for_status()
+    except requests.exceptions.ConnectTimeout as connect_timeout:
+        logger.error('ConnectionTimeout = %s', str(connect_timeout))
+        raise
+    except requests.exceptions.ConnectionError as connection_error:
+        logger.error('ConnectionError = %s', str(connection_error))
+        raise
+    except requests.exceptions.HTTPError as http_error:
+        logger.error('HTTPError = %s',
+                     str(http_error.response.status_code) + ' ' +
+                     http_error.response.reason)
+        raise
+    except requests.exceptions.InvalidURL as url_error:
+        logger.error('URLError = ' + url_error.response.status_code + ' ' +
+                     url_error.response.reason)
+        raise
+    except Exception:
+        logger.error('Generic exception: %s', traceback.format_exc())
+        raise
+    return response
+
+
+def url_validators(uri, timeout=10, verify=True, headers=None, session=None):
+    """Get the HTTP validators of a URL with a HEAD request.
+
+    Args:
+        uri (str): URL
+        timeout (int): request timeout; optional
+        verify (bool, str): verify server TLS certificate or not, or path to cert file; optional
+        headers (str): HTTP headers; optional
+        session (requests.Session): session to send the request with; optional
+    Returns:
+        validators (dict): ETag and Last-Modified headers present in the
+                           response; empty if none or if the request failed.
+
+    """
+    import requests  # pylint: disable=import-outside-toplevel
+
+    session = session or get_session()
+    try:
+        response = session.head(uri, timeout=timeout, verify=verify,
+                                headers=headers, allow_redirects=True)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as request_error:
+        logger.warning('Validators of %s not available: %s', uri, str(request_error))
+        return {}
+    return {name: response.headers[name] for name in ('ETag', 'Last-Modified')
+            if name in response.headers}
+
+
+def read(uri, encoding, timeout=10, verify=True, headers=None, session=None,
+         response_cache=None):
     """Read a text file from file system or URL.
 
     Args:
@@ -76,6 +180,11 @@ def read(uri, encoding, timeout=10, verify=True, headers=None):
         timeout (int): request timeout; optional
         verify (bool, str): verify server TLS certificate or not, or path to cert file; optional
         headers (str): HTTP headers; optional
+        session (requests.Session): session to download with; defaults to a
+                                    shared keep-alive session. Optional
+        response_cache (pyaxis.cache.ResponseCache): local copy of downloaded
+                                                     files, revalidated with
+                                                     conditional GETs; optional
     Returns:
         raw_pcaxis (str): file contents.
 
@@ -83,34 +192,15 @@ def read(uri, encoding, timeout=10, verify=True, headers=None):
     raw_pcaxis = ''
 
     if uri_type(uri) == 'URL':
-        try:
-            if headers:
-                response = requests.get(
-                    uri, stream=True, timeout=timeout, verify=verify, headers=headers)
-            else:
-                response = requests.get(uri, stream=True, timeout=timeout, verify=verify)
-            response.raise_for_status()
-            response.encoding = encoding
-            raw_pcaxis = response.text
+        response = _request(uri, timeout, verify, headers, session, response_cache)
+        if response.status_code == 304 and response_cache is not None:
             response.close()
-        except requests.exceptions.ConnectTimeout as connect_timeout:
-            logger.error('ConnectionTimeout = %s', str(connect_timeout))
-            raise
-        except requests.exceptions.ConnectionError as connection_error:
-            logger.error('ConnectionError = %s', str(connection_error))
-            raise
-        except requests.exceptions.HTTPError as http_error:
-            logger.error('HTTPError = %s',
-                         str(http_error.response.status_code) + ' ' +
-                         http_error.response.reason)
-            raise
-        except requests.exceptions.InvalidURL as url_error:
-            logger.error('URLError = ' + url_error.response.status_code + ' ' +
-                         url_error.response.reason)
-            raise
-        except Exception:
-            logger.error('Generic exception: %s', traceback.format_exc())
-            raise
+            return response_cache.read(uri).decode(encoding, errors='replace')
+        response.encoding = encoding
+        raw_pcaxis = response.text
+        if response_cache is not None:
+            response_cache.store(uri, response.headers, response.content)
+        response.close()
     else:  # file parsing
         file_object = open(uri, encoding=encoding)
         raw_pcaxis = file_object.read()
@@ -119,9 +209,69 @@ def read(uri, encoding, timeout=10, verify=True, headers=None):
     return raw_pcaxis
 
 
+def read_chunks(uri, encoding, timeout=10, verify=True, headers=None,
+                chunk_size=CHUNK_SIZE, session=None, response_cache=None):
+    """Read a text file from file system or URL in fixed-size chunks.
+
+       The file handle or HTTP response is consumed incrementally, so the
+       whole contents are never held in memory at once.
+
+    Args:
+        uri (str): file name or URL
+        encoding (str): charset encoding
+        timeout (int): request timeout; optional
+        verify (bool, str): verify server TLS certificate or not, or path to cert file; optional
+        headers (str): HTTP headers; optional
+        chunk_size (int): number of characters (bytes for URLs) per chunk; optional
+        session (requests.Session): session to download with; optional
+        response_cache (pyaxis.cache.ResponseCache): local copy of downloaded
+                                                     files, revalidated with
+                                                     conditional GETs; optional
+    Yields:
+        chunk (str): next piece of the file contents.
+
+    """
+    if uri_type(uri) == 'URL':
+        response = _request(uri, timeout, verify, headers, session, response_cache)
+        if response.status_code == 304 and response_cache is not None:
+            response.close()
+            byte_chunks = response_cache.iter_read(uri, chunk_size)
+            writer = None
+        else:
+            byte_chunks = response.iter_content(chunk_size)
+            writer = response_cache.writer(uri, response.headers) \
+                if response_cache is not None else None
+        decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        try:
+            for byte_chunk in byte_chunks:
+                if writer is not None:
+                    writer.write(byte_chunk)
+                chunk = decoder.decode(byte_chunk)
+                if chunk:
+                    yield chunk
+            chunk = decoder.decode(b'', final=True)
+            if chunk:
+                yield chunk
+            if writer is not None:
+                # the body is cached only once it has been read completely
+                writer.commit()
+        finally:
+            if writer is not None:
+                writer.abort()
+            response.close()
+    else:  # file parsing
+        with open(uri, encoding=encoding) as file_object:
+            chunk = file_object.read(chunk_size)
+            while chunk:
+                yield chunk
+                chunk = file_object.read(chunk_size)
+
+
 def parse(uri, encoding, timeout=10, verify=True,
           null_values=r'^"\."$', sd_values=r'"\.\."',
-          lang=None, headers=None):
+          lang=None, headers=None, stream=False, chunk_size=CHUNK_SIZE,
+          categorical=False, numeric=False, select=None, cache=None,
+          session=None, response_cache=None, dimensions='labels'):
     """Extract metadata and data sections from pc-axis.
 
     Args:
@@ -135,6 +285,34 @@ def parse(uri, encoding, timeout=10, verify=True,
                         values in the px file. Defaults to '..'.
         lang: language desired for the metadata and the column names of the dataframe
         headers (str): HTTP headers; optional
+        stream (bool): read the file in chunks instead of loading it whole;
+                       keeps peak memory close to the size of the output.
+                       Optional
+        chunk_size (int): chunk size used when stream is True; optional
+        categorical (bool): dimension columns as pandas.Categorical, with the
+                            VALUES of each dimension as categories in file
+                            order; optional
+        numeric (bool): DATA column as float64, with the values as written
+                        in the file (DECIMALS stays in METADATA) and NaN for
+                        null and sd cells, which are flagged in FLAGS;
+                        optional
+        select (dict): {dimension name: [members]} to keep only those cells
+                       of the cube; the rest are neither converted nor kept,
+                       and reading stops after the last selected cell.
+                       Optional
+        cache (pyaxis.cache.ParseCache): reuse the result of a previous parse
+                                         of the unchanged file or URL with the
+                                         same options; optional
+        session (requests.Session): session to download with; defaults to a
+                                    shared keep-alive session. Optional
+        response_cache (pyaxis.cache.ResponseCache): local copy of downloaded
+                                                     files, revalidated with
+                                                     conditional GETs; optional
+        dimensions (str): content of the dimension columns: 'labels' (VALUES),
+                          'codes' (CODES as categorical, VALUES where a
+                          dimension has no CODES) or 'index' (position of
+                          the member in VALUES, as unsigned integers).
+                          Optional
 
     Returns:
          pc_axis_dict (dictionary): dictionary of metadata and pandas df.
@@ -142,39 +320,263 @@ def parse(uri, encoding, timeout=10, verify=True,
                                     DATA: pandas dataframe
                                     TRANSLATION: dictionary of translations of the metadata 
                                     (empty if the px file is monolingual)
+                                    FLAGS: only if numeric is True, boolean
+                                    arrays 'NULL' and 'SD' aligned with DATA
+                                    LOOKUP: only if dimensions is not
+                                    'labels', see lookup_tables()
 
     """
-    # get file content or URL stream
-    try:
-        pc_axis = read(uri, encoding, timeout, verify, headers)
-    except ValueError:
-        logger.error('Generic exception: %s', traceback.format_exc())
-        raise
+    if cache is not None:
+        options = {
+            'encoding': encoding, 'null_values': null_values, 'sd_values': sd_values,
+            'lang': lang, 'categorical': categorical, 'numeric': numeric,
+            'select': select, 'dimensions': dimensions
+        }
+        key = cache.key(uri, options, timeout, verify, headers, session)
+        parsed_pc_axis = cache.get(key) if key else None
+        if parsed_pc_axis is None:
+            parsed_pc_axis = parse(
+                uri, encoding, timeout, verify, null_values, sd_values, lang,
+                headers, stream, chunk_size, categorical, numeric, select,
+                session=session, response_cache=response_cache, dimensions=dimensions)
+            if key:
+                cache.put(key, parsed_pc_axis)
+        return parsed_pc_axis
+
+    if stream or select is not None:
+        # metadata is read up to DATA=, data is tokenized chunk by chunk;
+        # a selection stops reading after its last cell
+        contents = read_chunks(uri, encoding, timeout, verify, headers, chunk_size,
+                               session, response_cache)
+    else:
+        # get file content or URL stream
+        try:
+            contents = read(uri, encoding, timeout, verify, headers, session,
+                            response_cache)
+        except ValueError:
+            logger.error('Generic exception: %s', traceback.format_exc())
+            raise
+
+    return parse_contents(contents, null_values, sd_values, lang, categorical,
+                          numeric, select, dimensions)
 
-    # metadata and data extraction and cleaning
-    metadata_elements, raw_data = metadata_extract(pc_axis)
+
+def parse_contents(contents, null_values=r'^"\."$', sd_values=r'"\.\."',
+                   lang=None, categorical=False, numeric=False, select=None,
+                   dimensions='labels'):
+    """Extract metadata and data sections from pc-axis contents already read.
+
+    Args:
+        contents (str or iterable): whole pc-axis contents, or an iterable of
+                                    text chunks, which is consumed lazily
+        null_values(str): regex with the pattern for the null values in the px
+                          file. Defaults to '.'.
+        sd_values(str): regex with the pattern for the statistical disclosured
+                        values in the px file. Defaults to '..'.
+        lang: language desired for the metadata and the column names of the dataframe
+        categorical (bool): dimension columns as pandas.Categorical; optional
+        numeric (bool): DATA column as float64, with FLAGS; optional
+        select (dict): {dimension name: [members]} to keep only those cells
+                       of the cube; optional
+        dimensions (str): 'labels', 'codes' or 'index', as in parse(); optional
+
+    Returns:
+         pc_axis_dict (dictionary): same as parse()
+
+    """
+    # a selection is read in streaming mode to stop after its last cell
+    metadata_elements, data = split_contents(contents, stream=select is not None)
 
     # stores raw metadata into a dictionary
     metadata = metadata_split_to_dict(metadata_elements)
 
+    all_metadata = metadata
+
     # handles the languages of the px file
     metadata, translation_dict = multilingual_parse(metadata, lang)
 
-    # explode raw data into a Series of values, which can contain nullos or sd
-    # (statistical disclosure)
-    data_values = Series(raw_data.split())
+    parsed_pc_axis = parse_data(metadata, translation_dict, data, null_values,
+                                sd_values, categorical, numeric, select, dimensions)
+    if dimensions != 'labels':
+        language_metadata = {
+            language: multilingual_parse(all_metadata, language)[0]
+            for language in all_metadata.get('LANGUAGES', [])}
+        parsed_pc_axis['LOOKUP'] = lookup_tables(metadata, language_metadata)
+    return parsed_pc_axis
+
+
+def parse_languages(uri, encoding, timeout=10, verify=True,
+                    null_values=r'^"\."$', sd_values=r'"\.\."',
+                    headers=None, stream=False, chunk_size=CHUNK_SIZE,
+                    numeric=False, select=None, session=None, response_cache=None):
+    """Parse a pc-axis once and get the result in each of its languages.
+
+       The data is read and converted once; the result in every language
+       other than the default one shares the DATA column and only renames
+       the dimensions and the categories of their members, following the
+       STUB[xx], HEADING[xx] and VALUES[xx] keywords.
+
+    Args:
+        uri (str): file name or URL
+        encoding (str): charset encoding
+        timeout (int): request timeout in seconds; optional
+        verify (bool, str): verify server TLS certificate or not, or path to cert file; optional
+        null_values(str): regex with the pattern for the null values in the px
+                          file. Defaults to '.'.
+        sd_values(str): regex with the pattern for the statistical disclosured
+                        values in the px file. Defaults to '..'.
+        headers (str): HTTP headers; optional
+        stream (bool): read the file in chunks; optional
+        chunk_size (int): chunk size used when stream is True; optional
+        numeric (bool): as in parse(); optional
+        select (dict): as in parse(), with names and members in the default
+                       language; optional
+        session (requests.Session): session to download with; optional
+        response_cache (pyaxis.cache.ResponseCache): local copy of downloaded
+                                                     files; optional
+
+    Returns:
+        parsed (dict): language -> the same as parse(lang=language,
+                       categorical=True). A monolingual file has a single
+                       entry, keyed by its LANGUAGE or None.
+
+    """
+    if stream or select is not None:
+        contents = read_chunks(uri, encoding, timeout, verify, headers, chunk_size,
+                               session, response_cache)
+    else:
+        contents = read(uri, encoding, timeout, verify, headers, session,
+                        response_cache)
+    metadata_elements, data = split_contents(contents, stream=select is not None)
+    all_metadata = metadata_split_to_dict(metadata_elements)
+
+    # the data is parsed once, in the default language
+    metadata, translation_dict = multilingual_parse(all_metadata, None)
+    parsed_pc_axis = parse_data(metadata, translation_dict, data, null_values,
+                                sd_values, True, numeric, select)
+    default_language = all_metadata.get('LANGUAGE', [None])[0]
+    parsed = {default_language: parsed_pc_axis}
+
+    dimension_names, dimension_members = get_dimensions(metadata)
+    for language in all_metadata.get('LANGUAGES', []):
+        if language == default_language:
+            continue
+        lang_metadata, lang_translation = multilingual_parse(all_metadata, language)
+        label_names, label_members = get_dimensions(lang_metadata)
+        parsed[language] = dict(
+            parsed_pc_axis,
+            METADATA=lang_metadata,
+            DATA=relabel_dimension_columns(parsed_pc_axis['DATA'], dimension_names,
+                                           dimension_members, label_names, label_members),
+            TRANSLATION=lang_translation)
+    return parsed
+
+
+def split_contents(contents, stream=False):
+    """Split pc-axis contents into metadata elements and the DATA section.
+
+    Args:
+        contents (str or iterable): whole pc-axis contents, or an iterable of
+                                    text chunks
+        stream (bool): return the DATA section as chunks even if contents is
+                       a whole string; optional
+
+    Returns:
+        metadata_elements (list of string): pairs ATTRIBUTE=VALUES
+        data (str or iterator of str): DATA section, whole if contents is a
+                                       whole string and stream is False, else
+                                       a lazy iterator of chunks
+
+    """
+    if isinstance(contents, str) and not stream:
+        # metadata and data extraction and cleaning
+        return metadata_extract(contents)
+    # metadata is read up to DATA=, data is tokenized chunk by chunk
+    return metadata_extract_stream([contents] if isinstance(contents, str) else contents)
+
+
+def parse_data(metadata, translation_dict, data, null_values=r'^"\."$',
+               sd_values=r'"\.\."', categorical=False, numeric=False, select=None,
+               dimensions='labels'):
+    """Build the dataframe of a pc-axis file from its metadata and DATA section.
+
+    Args:
+        metadata (dict): dictionary of metadata, in the language of the result
+        translation_dict (dict): dictionary of translations of the metadata
+        data (str or iterator of str): DATA section, as from split_contents()
+        null_values(str): regex with the pattern for the null values in the px
+                          file. Defaults to '.'.
+        sd_values(str): regex with the pattern for the statistical disclosured
+                        values in the px file. Defaults to '..'.
+        categorical (bool): dimension columns as pandas.Categorical; optional
+        numeric (bool): DATA column as float64, with FLAGS; optional
+        select (dict): {dimension name: [members]}; needs data as an iterator.
+                       Optional
+        dimensions (str): 'labels', 'codes' or 'index', as in parse(); optional
+
+    Returns:
+         pc_axis_dict (dictionary): same as parse()
+
+    """
+    from pandas import Series  # pylint: disable=import-outside-toplevel
+
+    if dimensions not in ('labels', 'codes', 'index'):
+        raise ValueError("dimensions must be 'labels', 'codes' or 'index'")
+    # codes and positions are derived from the categories of the labels
+    categorical = categorical or dimensions != 'labels'
+    stream = not isinstance(data, str)
+    if stream:
+        data_chunks = data
+    else:
+        raw_data = data
 
     # extract dimension names and members from
     # 'meta_dict' STUB and HEADING keys
     dimension_names, dimension_members = get_dimensions(metadata)
-
-    # build a dataframe
-    d_f = build_dataframe(
-        dimension_names,
-        dimension_members,
-        data_values,
-        null_values=null_values,
-        sd_values=sd_values)
+    all_members = dimension_members
+
+    if select is not None:
+        # positions of the selected cells in the row-major DATA section
+        offsets, dimension_members = selection_offsets(
+            dimension_names, dimension_members, select)
+        data_values = Series(select_data_tokens(data_chunks, offsets), dtype=object)
+        if hasattr(data_chunks, 'close'):
+            data_chunks.close()
+    elif not numeric:
+        # explode raw data into a Series of values, which can contain nullos or sd
+        # (statistical disclosure)
+        if stream:
+            data_values = Series(read_data_tokens(data_chunks), dtype=object)
+        else:
+            data_values = Series(raw_data.split())
+
+    if numeric:
+        # float64 values, with null and sd cells flagged apart
+        if select is None:
+            # parsed in bulk, without a Python string per value
+            data, null_mask, sd_mask = parse_numeric_data(
+                data_chunks if stream else raw_data, null_values, sd_values)
+        else:
+            data, null_mask, sd_mask = numeric_data_values(
+                data_values, null_values, sd_values)
+        d_f = dimension_columns(dimension_names, dimension_members,
+                                categorical=categorical)
+        d_f['DATA'] = data
+    else:
+        # build a dataframe
+        d_f = build_dataframe(
+            dimension_names,
+            dimension_members,
+            data_values,
+            null_values=null_values,
+            sd_values=sd_values,
+            categorical=categorical)
+
+    if dimensions == 'codes':
+        d_f = relabel_dimension_columns(d_f, dimension_names, all_members,
+                                        dimension_names, member_codes(metadata))
+    elif dimensions == 'index':
+        d_f = index_dimension_columns(d_f, dimension_names, all_members)
 
     # dictionary of metadata and data (pandas dataframe)
     parsed_pc_axis = {
@@ -182,4 +584,187 @@ def parse(uri, encoding, timeout=10, verify=True,
         'DATA': d_f,
         'TRANSLATION' : translation_dict
     }
+    if numeric:
+        parsed_pc_axis['FLAGS'] = {'NULL': null_mask, 'SD': sd_mask}
     return parsed_pc_axis
+
+
+def parse_metadata(uri, encoding, timeout=10, verify=True, lang=None,
+                   headers=None, chunk_size=METADATA_CHUNK_SIZE, session=None):
+    """Extract only the metadata section of a pc-axis.
+
+       The file or HTTP download is stopped as soon as the DATA= keyword is
+       reached; the data section is never read.
+
+    Args:
+        uri (str): file name or URL
+        encoding (str): charset encoding
+        timeout (int): request timeout in seconds; optional
+        verify (bool, str): verify server TLS certificate or not, or path to cert file; optional
+        lang: language desired for the metadata
+        headers (str): HTTP headers; optional
+        chunk_size (int): characters read from the source at a time; optional
+        session (requests.Session): session to download with; optional
+
+    Returns:
+         pc_axis_dict (dictionary): dictionary of metadata.
+                                    METADATA: dictionary of metadata
+                                    TRANSLATION: dictionary of translations of the metadata
+                                    (empty if the px file is monolingual)
+
+    """
+    chunks = read_chunks(uri, encoding, timeout, verify, headers, chunk_size, session)
+    try:
+        metadata_elements, _ = metadata_extract_stream(chunks)
+    finally:
+        # closes the file or HTTP response without reading the rest
+        chunks.close()
+
+    # stores raw metadata into a dictionary
+    metadata = metadata_split_to_dict(metadata_elements)
+
+    # handles the languages of the px file
+    metadata, translation_dict = multilingual_parse(metadata, lang)
+
+    return {
+        'METADATA': metadata,
+        'TRANSLATION': translation_dict
+    }
+
+
+def iter_parse(uri, encoding, timeout=10, verify=True,
+               null_values=r'^"\."$', sd_values=r'"\.\."',
+               lang=None, headers=None, *, rows=100000, chunk_size=CHUNK_SIZE,
+               categorical=False, session=None, response_cache=None):
+    """Parse a pc-axis into dataframes of at most rows rows each.
+
+       The file is read in streaming mode and the dimension columns are
+       computed only for the rows of each slice, so memory stays bounded
+       by rows regardless of the size of the cube.
+
+    Args:
+        uri (str): file name or URL
+        encoding (str): charset encoding
+        timeout (int): request timeout in seconds; optional
+        verify (bool, str): verify server TLS certificate or not, or path to cert file; optional
+        null_values(str): regex with the pattern for the null values in the px
+                          file. Defaults to '.'.
+        sd_values(str): regex with the pattern for the statistical disclosured
+                        values in the px file. Defaults to '..'.
+        lang: language desired for the metadata and the column names of the dataframe
+        headers (str): HTTP headers; optional
+        rows (int): number of rows of each dataframe; keyword-only, optional
+        chunk_size (int): characters read from the source at a time;
+                          keyword-only, optional
+        categorical (bool): dimension columns as pandas.Categorical;
+                            keyword-only, optional
+        session (requests.Session): session to download with; optional
+        response_cache (pyaxis.cache.ResponseCache): local copy of downloaded
+                                                     files, revalidated with
+                                                     conditional GETs; optional
+
+    Yields:
+        d_f (pandas dataframe): consecutive slices of the cube, indexed by
+                                their row number in the whole cube.
+
+    """
+    from pandas import Series  # pylint: disable=import-outside-toplevel
+
+    if rows < 1:
+        raise ValueError('rows must be a positive integer')
+
+    chunks = read_chunks(uri, encoding, timeout, verify, headers, chunk_size,
+                         session, response_cache)
+    metadata_elements, data_chunks = metadata_extract_stream(chunks)
+    metadata = metadata_split_to_dict(metadata_elements)
+    metadata, _ = multilingual_parse(metadata, lang)
+    dimension_names, dimension_members = get_dimensions(metadata)
+
+    start = 0
+    pending = []
+    for tokens in iter_data_tokens(data_chunks):
+        pending.extend(tokens)
+        offset = 0
+        while len(pending) - offset >= rows:
+            yield build_dataframe_slice(
+                dimension_names, dimension_members,
+                Series(pending[offset:offset + rows], dtype=object),
+                null_values, sd_values, start, categorical)
+            offset += rows
+            start += rows
+        del pending[:offset]
+    if pending:
+        yield build_dataframe_slice(
+            dimension_names, dimension_members,
+            Series(pending, dtype=object),
+            null_values, sd_values, start, categorical)
+
+
+def parse_many(uris, encoding, max_workers=8, executor='thread', max_in_flight=None,
+               **kwargs):
+    """Parse many pc-axis files or URLs concurrently.
+
+       With executor='thread' the downloads of several URLs overlap, each
+       worker thread keeping its own connections alive; with
+       executor='process' each parse, download included, runs in its own
+       process so tokenizing and dataframe construction use several cores.
+       At most max_in_flight parses are pending at any time, which bounds
+       the memory held by results not yet consumed. The sessions of the
+       worker threads are closed once the executor has shut down.
+
+    Args:
+        uris (iterable of str): file names or URLs
+        encoding (str): charset encoding of all of them
+        max_workers (int): number of threads or processes; optional
+        executor (str): 'thread' | 'process'; optional
+        max_in_flight (int): parses submitted but not yet yielded; defaults
+                             to twice max_workers. Optional
+        kwargs: any other argument of parse()
+
+    Yields:
+        tuple: (uri, parsed_pc_axis, error) in order of completion, where
+        error is the exception raised while parsing uri, or None.
+
+    """
+    if executor == 'thread':
+        pool_class = concurrent.futures.ThreadPoolExecutor
+    elif executor == 'process':
+        pool_class = concurrent.futures.ProcessPoolExecutor
+    else:
+        raise ValueError("executor must be 'thread' or 'process'")
+    max_in_flight = max_in_flight or 2 * max_workers
+
+    uris = iter(uris)
+    sessions = []
+    if executor == 'thread':
+        pool = pool_class(max_workers=max_workers,
+                          initializer=_own_sessions, initargs=(sessions,))
+    else:
+        pool = pool_class(max_workers=max_workers)
+    try:
+        pending = {}
+
+        def submit_next():
+            uri = next(uris, None)
+            if uri is None:
+                return False
+            pending[pool.submit(parse, uri, encoding, **kwargs)] = uri
+            return True
+
+        while len(pending) < max_in_flight and submit_next():
+            pass
+        while pending:
+            done, _ = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                uri = pending.pop(future)
+                error = future.exception()
+                if error is None:
+                    yield uri, future.result(), None
+                else:
+                    yield uri, None, error
+                submit_next()
+    finally:
+        pool.shutdown(wait=True)
+        for session in sessions:
+            session.close()
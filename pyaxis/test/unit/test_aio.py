@@ -0,0 +1,146 @@
+"""Unit tests for the asyncio API, against a local asyncio HTTP server."""
+
+import asyncio
+import os
+
+from pkg_resources import resource_filename
+
+from pyaxis import aio
+from pyaxis import pyaxis
+
+import pytest
+
+import requests
+
+
+data_path = resource_filename('pyaxis', 'test/data/')
+
+
+async def serve_data(reader, writer):
+    """Answer a single GET request with a file of the test data directory."""
+    request_line = await reader.readline()
+    while (await reader.readline()).strip():
+        pass
+    path = os.path.join(data_path, request_line.split()[1].decode().lstrip('/'))
+    if os.path.isfile(path):
+        with open(path, 'rb') as file_object:
+            body = file_object.read()
+        status = b'200 OK'
+    else:
+        body = b''
+        status = b'404 Not Found'
+    writer.write(b'HTTP/1.1 ' + status + b'\r\nContent-Length: ' +
+                 str(len(body)).encode() + b'\r\nConnection: close\r\n\r\n')
+    writer.write(body)
+    await writer.drain()
+    writer.close()
+
+
+async def with_server(coroutine_function):
+    """Run a coroutine function with the URL of a local asyncio server."""
+    server = await asyncio.start_server(serve_data, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        return await coroutine_function('http://127.0.0.1:' + str(port) + '/')
+
+
+def test_aread():
+    """aread() should return the same contents as read()."""
+    pc_axis = pyaxis.read(data_path + '1001.px', 'iso-8859-15')
+
+    async def read_both(server_url):
+        try:
+            return (await aio.aread(server_url + '1001.px', 'iso-8859-15', chunk_size=100),
+                    await aio.aread(data_path + '1001.px', 'iso-8859-15', chunk_size=100))
+        finally:
+            await aio.aclose()
+
+    assert asyncio.run(with_server(read_both)) == (pc_axis, pc_axis)
+
+
+def test_aparse():
+    """aparse() should parse concurrent downloads like parse()."""
+    parsed_pcaxis = pyaxis.parse(data_path + '14001.px', encoding='ISO-8859-15')
+
+    async def parse_concurrently(server_url):
+        # more downloads than connections in a requests pool
+        return await asyncio.gather(*[
+            aio.aparse(server_url + '14001.px', encoding='ISO-8859-15',
+                       chunk_size=4096, transport=aio.requests_transport)
+            for _ in range(12)])
+
+    for aparsed_pcaxis in asyncio.run(with_server(parse_concurrently)):
+        assert aparsed_pcaxis['METADATA'] == parsed_pcaxis['METADATA']
+        assert aparsed_pcaxis['DATA'].equals(parsed_pcaxis['DATA'])
+
+
+def test_aparse_transport():
+    """aparse() should download URLs with the given transport."""
+    requested = []
+
+    async def local_transport(uri, timeout, verify, headers, chunk_size):
+        requested.append(uri)
+        with open(data_path + '27067.px', 'rb') as file_object:
+            chunk = file_object.read(chunk_size)
+            while chunk:
+                yield chunk
+                chunk = file_object.read(chunk_size)
+
+    aparsed_pcaxis = asyncio.run(aio.aparse(
+        'http://example.org/27067.px', encoding='ISO-8859-2', numeric=True,
+        transport=local_transport))
+    parsed_pcaxis = pyaxis.parse(data_path + '27067.px', encoding='ISO-8859-2',
+                                 numeric=True)
+    assert requested == ['http://example.org/27067.px']
+    assert aparsed_pcaxis['DATA'].equals(parsed_pcaxis['DATA'])
+
+
+def test_aparse_http_error():
+    """aparse() should raise on HTTP errors."""
+    async def parse_missing(server_url):
+        return await aio.aparse(server_url + 'missing.px', encoding='ISO-8859-15',
+                                transport=aio.requests_transport)
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        asyncio.run(with_server(parse_missing))
+
+
+def test_aiohttp_transport():
+    """aread() and aparse() should download with aiohttp like with requests."""
+    pytest.importorskip('aiohttp')
+    pc_axis = pyaxis.read(data_path + '1001.px', 'iso-8859-15')
+    parsed_pcaxis = pyaxis.parse(data_path + '14001.px', encoding='ISO-8859-15')
+
+    async def read_and_parse(server_url):
+        try:
+            return (await aio.aread(server_url + '1001.px', 'iso-8859-15',
+                                    chunk_size=100, transport=aio.aiohttp_transport),
+                    await asyncio.gather(*[
+                        aio.aparse(server_url + '14001.px', encoding='ISO-8859-15',
+                                   chunk_size=4096, transport=aio.aiohttp_transport)
+                        for _ in range(4)]),
+                    aio.aiohttp_session() is aio.aiohttp_session())
+        finally:
+            await aio.aclose()
+
+    read_pcaxis, aparsed, shared = asyncio.run(with_server(read_and_parse))
+    assert read_pcaxis == pc_axis
+    assert shared
+    for aparsed_pcaxis in aparsed:
+        assert aparsed_pcaxis['METADATA'] == parsed_pcaxis['METADATA']
+        assert aparsed_pcaxis['DATA'].equals(parsed_pcaxis['DATA'])
+
+
+def test_aiohttp_transport_http_error():
+    """aparse() should raise on HTTP errors with the aiohttp transport."""
+    aiohttp = pytest.importorskip('aiohttp')
+
+    async def parse_missing(server_url):
+        try:
+            return await aio.aparse(server_url + 'missing.px', encoding='ISO-8859-15',
+                                    transport=aio.aiohttp_transport)
+        finally:
+            await aio.aclose()
+
+    with pytest.raises(aiohttp.ClientResponseError):
+        asyncio.run(with_server(parse_missing))
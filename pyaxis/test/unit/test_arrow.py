@@ -0,0 +1,54 @@
+"""Unit tests for the Arrow and Parquet export."""
+
+import json
+
+from numpy import isnan
+
+from pkg_resources import resource_filename
+
+from pyaxis import pyaxis
+
+import pytest
+
+pyarrow = pytest.importorskip('pyarrow')
+parquet = pytest.importorskip('pyarrow.parquet')
+arrow = pytest.importorskip('pyaxis.arrow')
+
+
+data_path = resource_filename('pyaxis', 'test/data/')
+
+
+def test_record_batch_reader():
+    """Batches should hold the same cells as parse(numeric=True)."""
+    parsed_pcaxis = pyaxis.parse(data_path + '27067.px', encoding='ISO-8859-2',
+                                 numeric=True)
+    reader = arrow.record_batch_reader(data_path + '27067.px', encoding='ISO-8859-2',
+                                       chunk_size=1000)
+    table = reader.read_all()
+    d_f = parsed_pcaxis['DATA']
+    assert table.num_rows == len(d_f)
+    for name in d_f.columns[:-1]:
+        assert pyarrow.types.is_dictionary(table.schema.field(name).type)
+        assert table.column(name).to_pylist() == d_f[name].tolist()
+    data = table.column('DATA').to_numpy(zero_copy_only=False)
+    assert (isnan(data) == isnan(d_f['DATA'].values)).all()
+    assert (data[~isnan(data)] == d_f['DATA'].values[~isnan(data)]).all()
+    assert table.column('NULL').to_pylist() == parsed_pcaxis['FLAGS']['NULL'].tolist()
+    assert table.column('SD').to_pylist() == parsed_pcaxis['FLAGS']['SD'].tolist()
+    assert table.column('DATA').null_count == 252 + 208
+
+
+def test_to_parquet(tmp_path):
+    """Parquet output should keep the cells and the main metadata."""
+    out_path = str(tmp_path / '14001.parquet')
+    rows = arrow.to_parquet(data_path + '14001.px', out_path,
+                            encoding='ISO-8859-15', chunk_size=10000)
+    table = parquet.read_table(out_path)
+    assert rows == table.num_rows == 8064
+    assert parquet.ParquetFile(out_path).metadata.num_row_groups > 1
+    metadata = table.schema.metadata
+    assert json.loads(metadata[b'SOURCE']) == ['Instituto Nacional de Estadística']
+    assert 'CODES(Comunidad Autónoma de residencia del matrimonio)'.encode() in metadata
+    assert b'VALUES(sexo)' not in metadata
+    assert table.column('sexo').to_pylist()[:3] == ['Esposos', 'Esposos', 'Esposos']
+    assert table.column('DATA').to_pylist()[-1] == 4
@@ -0,0 +1,73 @@
+"""Unit tests for cache module."""
+
+import io
+import os
+import shutil
+
+from numpy import array_equal, load
+
+from pkg_resources import resource_filename
+
+from pyaxis import pyaxis
+from pyaxis.cache import ParseCache, dump_entry, load_entry
+
+
+data_path = resource_filename('pyaxis', 'test/data/')
+
+
+def test_parse_cache(tmp_path):
+    """A second parse of the unchanged file should come from the cache."""
+    uri = str(tmp_path / '14001.px')
+    shutil.copy(data_path + '14001.px', uri)
+    cache = ParseCache(str(tmp_path / 'cache'))
+    parsed_pcaxis = pyaxis.parse(uri, encoding='ISO-8859-15', cache=cache)
+    assert len(os.listdir(cache.directory)) == 1
+    cached_pcaxis = pyaxis.parse(uri, encoding='ISO-8859-15', cache=cache)
+    assert cached_pcaxis['DATA'].equals(parsed_pcaxis['DATA'])
+    assert cached_pcaxis['METADATA'] == parsed_pcaxis['METADATA']
+    # other options are a different entry
+    pyaxis.parse(uri, encoding='ISO-8859-15', numeric=True, cache=cache)
+    assert len(os.listdir(cache.directory)) == 2
+    # a modified file is parsed again
+    os.utime(uri, ns=(0, 0))
+    pyaxis.parse(uri, encoding='ISO-8859-15', cache=cache)
+    assert len(os.listdir(cache.directory)) == 3
+
+
+def test_evict(tmp_path):
+    """Least recently used entries should be evicted beyond max_bytes."""
+    cache = ParseCache(str(tmp_path), max_bytes=3000)
+    cache.put('a', {'DATA': 'x' * 1000})
+    cache.put('b', {'DATA': 'x' * 1000})
+    os.utime(cache.entry_path('b'), ns=(0, 0))
+    cache.put('c', {'DATA': 'x' * 1000})
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.get('c') is not None
+
+
+def test_entry_round_trip():
+    """Entries should load back the same result, without pickle."""
+    parsed_pcaxis = pyaxis.parse(data_path + 'px-x-0602000000_107.px',
+                                 encoding='ISO-8859-2', numeric=True,
+                                 dimensions='codes')
+    file_object = io.BytesIO()
+    dump_entry(parsed_pcaxis, file_object)
+    file_object.seek(0)
+    with load(file_object, allow_pickle=False) as arrays:
+        assert all(arrays[name].dtype != object for name in arrays.files)
+    file_object.seek(0)
+    loaded_pcaxis = load_entry(file_object)
+    assert loaded_pcaxis['METADATA'] == parsed_pcaxis['METADATA']
+    assert loaded_pcaxis['DATA'].equals(parsed_pcaxis['DATA'])
+    assert list(loaded_pcaxis['DATA'].dtypes) == list(parsed_pcaxis['DATA'].dtypes)
+    assert array_equal(loaded_pcaxis['FLAGS']['SD'], parsed_pcaxis['FLAGS']['SD'])
+    for name, table in parsed_pcaxis['LOOKUP'].items():
+        assert loaded_pcaxis['LOOKUP'][name].equals(table)
+
+    plain_pcaxis = pyaxis.parse(data_path + '14001.px', encoding='ISO-8859-15')
+    file_object = io.BytesIO()
+    dump_entry(plain_pcaxis, file_object)
+    file_object.seek(0)
+    # null cells are '' and sd cells NaN in the text column
+    assert load_entry(file_object)['DATA'].equals(plain_pcaxis['DATA'])
@@ -0,0 +1,93 @@
+"""Unit tests for the N-dimensional array output."""
+
+from numpy import array_equal, flatnonzero, isnan, shares_memory
+
+from pkg_resources import resource_filename
+
+from pyaxis import cube, pyaxis
+
+import pytest
+
+
+data_path = resource_filename('pyaxis', 'test/data/')
+
+
+def test_parse_cube():
+    """The cube should hold the cells of parse() in STUB and HEADING axes."""
+    parsed_cube = cube.parse_cube(data_path + '14001.px', encoding='ISO-8859-15')
+    parsed_pcaxis = pyaxis.parse(data_path + '14001.px', encoding='ISO-8859-15',
+                                 numeric=True)
+    assert parsed_cube['DATA'].shape == (21, 48, 2, 4)
+    assert parsed_cube['FLAGS']['SD'].shape == (21, 48, 2, 4)
+    assert parsed_cube['DATA'][0, 0, 0, 1] == 131818
+    assert array_equal(parsed_cube['DATA'].ravel(), parsed_pcaxis['DATA']['DATA'],
+                       equal_nan=True)
+    streamed_cube = cube.parse_cube(data_path + '14001.px', encoding='ISO-8859-15',
+                                    stream=True, chunk_size=1000)
+    assert array_equal(streamed_cube['DATA'], parsed_cube['DATA'], equal_nan=True)
+
+
+def test_to_ndarray():
+    """A numeric parse() result should be reshaped without copying."""
+    parsed_pcaxis = pyaxis.parse(data_path + '27067.px', encoding='ISO-8859-2',
+                                 numeric=True)
+    array = cube.to_ndarray(parsed_pcaxis)
+    assert array.shape == (1, 29, 4, 7)
+    assert shares_memory(array, parsed_pcaxis['DATA']['DATA'].values)
+
+    selected_pcaxis = pyaxis.parse(data_path + '27067.px', encoding='ISO-8859-2',
+                                   numeric=True, select={'Periodo': '2018M12'})
+    with pytest.raises(ValueError):
+        cube.to_ndarray(selected_pcaxis)
+
+
+def test_to_xarray():
+    """The DataArray should be labelled by VALUES or CODES."""
+    xarray = pytest.importorskip('xarray')
+    parsed_cube = cube.parse_cube(data_path + '14001.px', encoding='ISO-8859-15')
+    data_array = cube.to_xarray(parsed_cube)
+    assert isinstance(data_array, xarray.DataArray)
+    assert shares_memory(data_array.values, parsed_cube['DATA'])
+    assert data_array.dims[2] == 'sexo'
+    assert data_array.sel({'sexo': 'Esposos', 'edad de los cónyuges': 'Todas las edades',
+                           'Comunidad Autónoma de residencia del matrimonio': 'Total',
+                           'estado civil anterior de los cónyuges': 'Solteros/as'}) == 131818
+    assert data_array.attrs['source'] == 'Instituto Nacional de Estadística'
+    assert data_array.attrs['title'].startswith(
+        'Matrimonios de diferente sexo por Comunidad Autónoma de residencia del matrimonio')
+
+    coded_array = cube.to_xarray(parsed_cube, coords='codes')
+    assert coded_array.coords[coded_array.dims[0]].values[0] == 'CA00'
+
+
+def test_parse_sparse():
+    """Only populated cells should be kept, at their position in the cube."""
+    parsed_cube = cube.parse_cube(data_path + '27067.px', encoding='ISO-8859-2')
+    sparse = cube.parse_sparse(data_path + '27067.px', encoding='ISO-8859-2',
+                               chunk_size=100)
+    populated = ~isnan(parsed_cube['DATA'].ravel())
+    assert sparse['SPARSE']
+    assert sparse['DENSITY'] == populated.mean()
+    assert len(sparse['DATA']) == populated.sum()
+    assert array_equal(sparse['DATA'].index, flatnonzero(populated))
+    assert array_equal(sparse['DATA']['DATA'],
+                       parsed_cube['DATA'].ravel()[populated])
+    assert sparse['DATA'][sparse['DATA'].columns[1]].dtype == 'category'
+
+    dense = cube.parse_sparse(data_path + '27067.px', encoding='ISO-8859-2',
+                              density_threshold=0.4)
+    assert not dense['SPARSE']
+    assert array_equal(dense['DATA'], parsed_cube['DATA'], equal_nan=True)
+    for flag in ('NULL', 'SD'):
+        assert array_equal(dense['FLAGS'][flag], parsed_cube['FLAGS'][flag])
+    assert dense['FLAGS']['NULL'].any() and dense['FLAGS']['SD'].any()
+
+
+def test_to_coo():
+    """Coordinates should index the populated cells of the dense cube."""
+    parsed_cube = cube.parse_cube(data_path + '14001.px', encoding='ISO-8859-15')
+    sparse = cube.parse_sparse(data_path + '14001.px', encoding='ISO-8859-15')
+    coords, values, shape = cube.to_coo(sparse)
+    assert shape == parsed_cube['DATA'].shape
+    assert coords.shape == (4, len(values))
+    assert array_equal(parsed_cube['DATA'][tuple(coords)], values)
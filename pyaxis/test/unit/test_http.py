@@ -0,0 +1,132 @@
+"""Unit tests for downloads, against a local HTTP server."""
+
+import functools
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from pkg_resources import resource_filename
+
+from pyaxis import pyaxis
+from pyaxis.cache import ParseCache, ResponseCache
+
+import pytest
+
+import requests
+
+
+data_path = resource_filename('pyaxis', 'test/data/')
+
+
+class RecordingHandler(SimpleHTTPRequestHandler):
+    """Serve the test data directory, recording the status of each answer."""
+
+    statuses = []
+
+    def send_response(self, code, message=None):
+        self.statuses.append(code)
+        super().send_response(code, message)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+@pytest.fixture(name='server_url')
+def fixture_server_url():
+    """Run a local HTTP server for the duration of a test."""
+    RecordingHandler.statuses = []
+    handler = functools.partial(RecordingHandler, directory=data_path)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:' + str(server.server_address[1]) + '/'
+    server.shutdown()
+    server.server_close()
+
+
+def test_read_url(server_url):
+    """A URL should be read like the local file, in one piece or in chunks."""
+    pc_axis = pyaxis.read(data_path + '1001.px', 'iso-8859-15')
+    with requests.Session() as session:
+        assert pyaxis.read(server_url + '1001.px', 'iso-8859-15',
+                           session=session) == pc_axis
+        assert ''.join(pyaxis.read_chunks(server_url + '1001.px', 'iso-8859-15',
+                                          chunk_size=100, session=session)) == pc_axis
+
+
+def test_conditional_get(server_url, tmp_path):
+    """A 304 answer should be served from the response cache."""
+    response_cache = ResponseCache(str(tmp_path))
+    uri = server_url + '14001.px'
+    parsed_pcaxis = pyaxis.parse(uri, encoding='ISO-8859-15',
+                                 response_cache=response_cache)
+    assert RecordingHandler.statuses == [200]
+    assert response_cache.conditional_headers(uri)
+    cached_pcaxis = pyaxis.parse(uri, encoding='ISO-8859-15',
+                                 response_cache=response_cache)
+    streamed_pcaxis = pyaxis.parse(uri, encoding='ISO-8859-15', stream=True,
+                                   response_cache=response_cache)
+    assert RecordingHandler.statuses == [200, 304, 304]
+    assert cached_pcaxis['DATA'].equals(parsed_pcaxis['DATA'])
+    assert streamed_pcaxis['DATA'].equals(parsed_pcaxis['DATA'])
+
+
+def test_parse_cache_url_key(server_url, tmp_path):
+    """Request headers should be part of the key of a URL."""
+    cache = ParseCache(str(tmp_path))
+    uri = server_url + '14001.px'
+    key = cache.key(uri, {})
+    assert key is not None
+    assert cache.key(uri, {}) == key
+    assert cache.key(uri, {}, headers={'Accept-Language': 'fr'}) != key
+
+
+def test_partial_read_not_cached(server_url, tmp_path):
+    """A download stopped at DATA= should not become the local copy."""
+    response_cache = ResponseCache(str(tmp_path))
+    uri = server_url + '14001.px'
+    chunks = pyaxis.read_chunks(uri, 'ISO-8859-15', chunk_size=1024,
+                                response_cache=response_cache)
+    next(chunks)
+    chunks.close()
+    assert not response_cache.conditional_headers(uri)
+
+
+def test_session_per_thread(server_url):
+    """parse_many() threads should each download with a session of their own."""
+    sessions = {}
+
+    def record_session():
+        sessions[threading.get_ident()] = pyaxis.get_session()
+
+    assert pyaxis.get_session() is pyaxis.get_session()
+    thread = threading.Thread(target=record_session)
+    thread.start()
+    thread.join()
+    assert sessions[thread.ident] is not pyaxis.get_session()
+
+    uris = [server_url + '14001.px', server_url + '1001.px'] * 3
+    results = list(pyaxis.parse_many(uris, encoding='ISO-8859-15', max_workers=3))
+    assert all(error is None for _, _, error in results)
+
+
+def test_parse_many_closes_sessions(server_url, monkeypatch):
+    """parse_many() should close the sessions of its worker threads."""
+    opened = []
+    closed = []
+    session_class = requests.Session
+
+    class RecordingSession(session_class):
+        def __init__(self):
+            super().__init__()
+            opened.append(self)
+
+        def close(self):
+            closed.append(self)
+            super().close()
+
+    monkeypatch.setattr(requests, 'Session', RecordingSession)
+    uris = [server_url + '14001.px'] * 4
+    results = list(pyaxis.parse_many(uris, encoding='ISO-8859-15', max_workers=2))
+    assert all(error is None for _, _, error in results)
+    assert opened
+    assert closed == opened
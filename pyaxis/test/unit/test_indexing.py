@@ -0,0 +1,51 @@
+"""Unit tests for indexing module."""
+
+import shutil
+
+from numpy import isnan
+
+from pkg_resources import resource_filename
+
+from pyaxis import indexing, pyaxis
+
+
+data_path = resource_filename('pyaxis', 'test/data/')
+
+
+def test_scan_value_offsets():
+    """Should record the byte offset of every stride-th value."""
+    buffer = b'X=1;DATA=\n1 ".." 3\n4;'
+    offsets, count = indexing.scan_value_offsets(
+        buffer, indexing.find_data_start(buffer), 2)
+    assert count == 4
+    assert [buffer[offset:offset + 1] for offset in offsets] == [b'1', b'3']
+
+
+def test_slice(tmp_path):
+    """A slice should match the same rows of parse() with select."""
+    uri = str(tmp_path / '14001.px')
+    shutil.copy(data_path + '14001.px', uri)
+    select = {'sexo': 'Esposas',
+              'Comunidad Autónoma de residencia del matrimonio': ['Cantabria', 'Total']}
+    parsed_pcaxis = pyaxis.parse(uri, encoding='ISO-8859-15', select=select)
+    with indexing.open_index(uri, encoding='ISO-8859-15', every=3) as index:
+        assert index.slice(select).equals(parsed_pcaxis['DATA'])
+        assert index.cell({'Comunidad Autónoma de residencia del matrimonio': 'Total',
+                           'edad de los cónyuges': 'Todas las edades',
+                           'sexo': 'Esposos',
+                           'estado civil anterior de los cónyuges': 'Solteros/as'}) == \
+            pyaxis.parse(uri, encoding='ISO-8859-15')['DATA']['DATA'][1]
+
+
+def test_open_index(tmp_path):
+    """The persisted index should be loaded until the file changes."""
+    uri = str(tmp_path / '27067.px')
+    shutil.copy(data_path + '27067.px', uri)
+    index = indexing.open_index(uri, encoding='ISO-8859-2')
+    loaded = indexing.load_index(uri)
+    assert loaded.is_fresh()
+    assert list(loaded.offsets) == list(index.offsets)
+    assert isnan(loaded.slice(numeric=True)['DATA'][0])
+    with open(uri, 'a', encoding='ISO-8859-2') as file_object:
+        file_object.write('\n')
+    assert not indexing.load_index(uri).is_fresh()
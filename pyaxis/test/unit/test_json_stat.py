@@ -1,8 +1,13 @@
 """Unit tests for json_stat module."""
 
+import io
+import json
+
 from pkg_resources import resource_filename
 from pyaxis import pyaxis, json_stat
 
+import pytest
+
 
 data_path = resource_filename('pyaxis', 'test/data/')
 
@@ -19,3 +24,75 @@ def test_to_json_stat():
     assert json_obj['source'] == ['Instituto Nacional de Estadística']
     assert json_obj['value'][9] == '1'
     assert json_obj['value'][len(json_obj['value']) - 1] == '1600'
+
+
+def test_json_stat_dict():
+    """Should build a JSON-Stat dataset in the order of the px file."""
+    p_x = pyaxis.parse(
+        data_path + '14001.px',
+        encoding='ISO-8859-15')
+    json_obj = json_stat.json_stat_dict(p_x)
+    assert json_obj['id'] == \
+        ['Comunidad Autónoma de residencia del matrimonio',
+         'edad de los cónyuges', 'sexo',
+         'estado civil anterior de los cónyuges', 'Variables']
+    assert json_obj['size'] == [21, 48, 2, 4, 1]
+    assert json_obj['source'] == 'Instituto Nacional de Estadística'
+    assert json_obj['label'] == \
+        'Matrimonios de diferente sexo por Comunidad Autónoma de residencia ' \
+        'del matrimonio, edad de los cónyuges, sexo  y estado civil anterior ' \
+        'de los cónyuges.'
+    assert json_obj['dimension']['sexo']['category']['index'] == \
+        {'Esposos': 0, 'Esposas': 1}
+    assert json_obj['value'][:8] == p_x['DATA']['DATA'].tolist()[:8]
+    assert json_obj['value'][8] is None
+    assert json_obj['status']['8'] == '..'
+
+
+def test_dump_json_stat():
+    """Null and sd cells should be null values with a status."""
+    p_x = pyaxis.parse(
+        data_path + '27067.px',
+        encoding='ISO-8859-2',
+        numeric=True)
+    file_object = io.StringIO()
+    json_stat.dump_json_stat(p_x, file_object)
+    json_obj = json.loads(file_object.getvalue())
+    assert json_obj['value'].count(None) == 252 + 208
+    assert list(json_obj['status'].values()).count('.') == 252
+    assert list(json_obj['status'].values()).count('..') == 208
+    assert json_obj['dimension']['Variables']['category']['unit']['DATA']['decimals'] == 1
+    assert json_stat.json_stat_dict(pyaxis.parse(
+        data_path + '27067.px', encoding='ISO-8859-2'))['status'] == json_obj['status']
+
+
+def test_stream_json_stat():
+    """Streamed JSON-Stat should equal the dataset built after parsing."""
+    file_object = io.StringIO()
+    cells = json_stat.stream_json_stat(
+        data_path + '27067.px', file_object, encoding='ISO-8859-2',
+        chunk_size=1000)
+    json_obj = json.loads(file_object.getvalue())
+    assert cells == 812
+    assert json_obj == json_stat.json_stat_dict(pyaxis.parse(
+        data_path + '27067.px', encoding='ISO-8859-2', numeric=True))
+
+    file_object = io.StringIO()
+    json_stat.stream_json_stat(data_path + '14001.px', file_object,
+                               encoding='ISO-8859-15')
+    json_obj = json.loads(file_object.getvalue())
+    assert json_obj['value'][:2] == [162743, 131818]
+    assert json_obj['status']['8'] == '..'
+
+
+def test_stream_json_stat_cells(tmp_path):
+    """A DATA section short of cells should raise before closing the values."""
+    with open(data_path + '27067.px', encoding='ISO-8859-2') as px_file:
+        contents = px_file.read()
+    path = str(tmp_path / 'short.px')
+    with open(path, 'w', encoding='ISO-8859-2') as px_file:
+        px_file.write(contents.rstrip().rstrip(';').rsplit(None, 1)[0] + ';\n')
+    file_object = io.StringIO()
+    with pytest.raises(ValueError):
+        json_stat.stream_json_stat(path, file_object, encoding='ISO-8859-2')
+    assert not file_object.getvalue().endswith('}')
@@ -1,8 +1,11 @@
 """Unit tests for pyaxis module."""
 
-from numpy import isnan
+import subprocess
+import sys
 
-from pandas import Series
+from numpy import array_equal, isnan, shares_memory
+
+from pandas import Series, concat, to_numeric
 
 from pkg_resources import resource_filename
 
@@ -137,6 +140,8 @@ def test_make_unique_list():
     mylist = ["a", "b", "t", "a"]
     mylist = helpers_string.make_unique_list(mylist)
     assert len(mylist) == len(set(mylist))
+    # first appearance order is kept
+    assert helpers_string.make_unique_list(['b', 'a', 'b', None, 'a']) == ['b', 'a', None]
 
 def test_brackets_stripper():
     """brackets_stripper should strip a string from brackets and their content"""
@@ -144,6 +149,12 @@ def test_brackets_stripper():
     mystring = helpers_string.brackets_stripper(mystring)
     assert mystring == "This is a string "
 
+def test_join_text():
+    """join_text should separate the quoted parts of a value with a blank"""
+    assert helpers_string.join_text(['residencia', 'del matrimonio']) == \
+        'residencia del matrimonio'
+    assert helpers_string.join_text('1') == '1'
+
 def test_multilingual_checker():
     """multilingual_checker should return a tuple with a boolean for translation and a list of languages"""
     px= data_path + "px-x-0602000000_107.px"
@@ -242,5 +253,405 @@ def test_statistical_disclosure():
     assert parsed_pcaxis['DATA']['DATA'].iloc[804] == ''
 
 
+def test_read_chunks():
+    """read_chunks() should yield pieces that join into the whole file."""
+    chunks = list(pyaxis.read_chunks(
+        data_path + '1001.px', 'iso-8859-15', chunk_size=500))
+    assert len(chunks) == 7
+    assert ''.join(chunks) == pyaxis.read(data_path + '1001.px', 'iso-8859-15')
+
+
+def test_metadata_extract_stream():
+    """Should extract the same metadata and data as metadata_extract()."""
+    pc_axis = pyaxis.read(
+        data_path + '14001.px',
+        'iso-8859-15')
+    metadata_elements, raw_data = metadata_processing.metadata_extract(pc_axis)
+    chunks = pyaxis.read_chunks(
+        data_path + '14001.px', 'iso-8859-15', chunk_size=1000)
+    stream_elements, data_chunks = metadata_processing.metadata_extract_stream(chunks)
+    assert stream_elements == metadata_elements
+    assert ''.join(data_chunks).split() == raw_data.split()
+
+
+def test_iter_data_tokens():
+    """Values split by a chunk boundary should be joined back together."""
+    chunks = ['1.5 "." 2', '8 ".', '." 4 ', '5']
+    tokens = list(data_processing.iter_data_tokens(chunks))
+    assert tokens == [['1.5', '"."'], ['28'], ['".."', '4'], ['5']]
+    assert data_processing.read_data_tokens(chunks) == \
+        ['1.5', '"."', '28', '".."', '4', '5']
+
+
+def test_parse_stream():
+    """Streaming parse should produce the same dataframe as parse()."""
+    parsed_pcaxis = pyaxis.parse(
+        data_path + '27067.px',
+        encoding='ISO-8859-2')
+    streamed_pcaxis = pyaxis.parse(
+        data_path + '27067.px',
+        encoding='ISO-8859-2',
+        stream=True,
+        chunk_size=4096)
+    assert streamed_pcaxis['METADATA'] == parsed_pcaxis['METADATA']
+    assert streamed_pcaxis['DATA'].equals(parsed_pcaxis['DATA'])
+
+
+def test_cartesian_product_codes():
+    """Member positions should follow the row-major order of the product."""
+    codes = data_processing.cartesian_product_codes([2, 3, 2], start=3, stop=8)
+    assert [list(code) for code in codes] == \
+        [[0, 0, 0, 1, 1], [1, 2, 2, 0, 0], [1, 0, 1, 0, 1]]
+
+
+def test_build_dataframe_slice():
+    """A slice should match the same rows of the whole dataframe."""
+    null_values = r'^"\."$'
+    sd_values = r'"\.\."'
+    pc_axis = pyaxis.read(
+        data_path + '14001.px',
+        'iso-8859-15')
+    metadata_elements, raw_data = pyaxis.metadata_extract(pc_axis)
+    metadata = pyaxis.metadata_split_to_dict(metadata_elements)
+    dimension_names, dimension_members = pyaxis.get_dimensions(metadata)
+    data_values = Series(raw_data.split())
+    df = pyaxis.build_dataframe(
+        dimension_names, dimension_members, data_values,
+        null_values=null_values, sd_values=sd_values)
+    df_slice = data_processing.build_dataframe_slice(
+        dimension_names, dimension_members, data_values[150:300],
+        null_values=null_values, sd_values=sd_values, start=150)
+    assert df_slice.equals(df.iloc[150:300])
+
+
+def test_iter_parse():
+    """iter_parse() should yield consecutive slices of the parsed dataframe."""
+    parsed_pcaxis = pyaxis.parse(
+        data_path + '27067.px',
+        encoding='ISO-8859-2')
+    slices = list(pyaxis.iter_parse(
+        data_path + '27067.px',
+        encoding='ISO-8859-2',
+        rows=100,
+        chunk_size=4096))
+    assert len(slices) == 9
+    assert all(len(d_f) == 100 for d_f in slices[:-1])
+    assert concat(slices).equals(parsed_pcaxis['DATA'])
+
+
+def test_parse_categorical():
+    """Dimension columns should be categoricals ordered as in VALUES."""
+    parsed_pcaxis = pyaxis.parse(
+        data_path + '14001.px',
+        encoding='ISO-8859-15',
+        categorical=True)
+    plain_pcaxis = pyaxis.parse(
+        data_path + '14001.px',
+        encoding='ISO-8859-15')
+    d_f = parsed_pcaxis['DATA']
+    column = 'Comunidad Autónoma de residencia del matrimonio'
+    assert d_f.dtypes[column] == 'category'
+    assert list(d_f[column].cat.categories) == \
+        parsed_pcaxis['METADATA']['VALUES(' + column + ')']
+    assert d_f[column].astype(object).equals(plain_pcaxis['DATA'][column])
+    assert d_f['DATA'].equals(plain_pcaxis['DATA']['DATA'])
+    assert d_f.sort_values(column)[column].iloc[0] == 'Total'
+
+
+def test_categorical_column_duplicates():
+    """Repeated members should be merged into a single category."""
+    column = data_processing.categorical_column(['b', 'a', 'b'], [0, 1, 2, 2])
+    assert list(column.categories) == ['b', 'a']
+    assert list(column) == ['b', 'a', 'b', 'b']
+
+
+def test_parse_numeric():
+    """DATA should be float64, with null and sd cells flagged apart."""
+    parsed_pcaxis = pyaxis.parse(
+        data_path + '27067.px',
+        encoding='ISO-8859-2',
+        numeric=True)
+    d_f = parsed_pcaxis['DATA']
+    flags = parsed_pcaxis['FLAGS']
+    assert d_f.dtypes['DATA'] == 'float64'
+    assert flags['SD'].dtype == bool
+    assert flags['SD'][0] and not flags['NULL'][0]
+    assert flags['NULL'][804] and not flags['SD'][804]
+    assert flags['NULL'].sum() == 252
+    assert flags['SD'].sum() == 208
+    assert isnan(d_f['DATA'].iloc[0])
+    assert isnan(d_f['DATA'].iloc[804])
+    assert d_f['DATA'].notna().sum() == len(d_f) - 252 - 208
+
+
+def test_parse_numeric_not_rounded():
+    """Numeric values should be those of the file, not rounded to DECIMALS."""
+    default_pcaxis = pyaxis.parse(data_path + '1001.px', encoding='ISO-8859-2')
+    for stream in (False, True):
+        numeric_pcaxis = pyaxis.parse(data_path + '1001.px', encoding='ISO-8859-2',
+                                      numeric=True, stream=stream)
+        assert array_equal(numeric_pcaxis['DATA']['DATA'],
+                           to_numeric(default_pcaxis['DATA']['DATA'], errors='coerce'),
+                           equal_nan=True)
+    assert numeric_pcaxis['METADATA']['DECIMALS'] == '1'
+
+
+def test_numeric_data_values_decimals():
+    """Values should be rounded when decimals is given."""
+    data_values = Series(['1.26', '"."', '".."', '7'])
+    data, null_mask, sd_mask = data_processing.numeric_data_values(
+        data_values, r'^"\."$', r'"\.\."', decimals=1)
+    assert data[0] == 1.3
+    assert data[3] == 7.0
+    assert list(null_mask) == [False, True, False, False]
+    assert list(sd_mask) == [False, False, True, False]
+    assert data_processing.get_decimals({'DECIMALS': '1'}) == 1
+    assert data_processing.get_decimals({}) is None
+
+
+def test_regex_literal():
+    """regex_literal should reduce only plain patterns to literals."""
+    assert helpers_string.regex_literal(r'^"\."$') == ('"."', True)
+    assert helpers_string.regex_literal(r'"\.\."') == ('".."', False)
+    assert helpers_string.regex_literal(r'^"\.+"$') is None
+    assert helpers_string.regex_literal(r'\d') is None
+
+
+def test_classify_data_values():
+    """Literal and regex patterns should flag the same cells as str.match."""
+    data_values = Series(['1', '"."', '".."', '"..."', '"-"', '2.5'])
+    for null_values, sd_values in [(r'^"\."$', r'"\.\."'),
+                                   (r'^"[.-]"$', r'^"\.{2,}"$')]:
+        null_mask, sd_mask = data_processing.classify_data_values(
+            data_values, null_values, sd_values)
+        expected_sd = data_values.str.match(sd_values)
+        expected_null = data_values.str.match(null_values) & ~expected_sd
+        assert list(sd_mask) == list(expected_sd)
+        assert list(null_mask) == list(expected_null)
+
+
+def test_parse_numeric_data():
+    """Bulk parsing should flag quoted values and fall back on other tokens."""
+    null_values = r'^"\."$'
+    sd_values = r'"\.\."'
+    data, null_mask, sd_mask = data_processing.parse_numeric_data(
+        ['1.5 "." 2', '8 ".', '." "..." 4 "-"\n'], null_values, sd_values)
+    assert list(data[[0, 2, 5]]) == [1.5, 28.0, 4.0]
+    assert isnan(data[6])
+    assert list(null_mask) == [False, True, False, False, False, False, False]
+    assert list(sd_mask) == [False, False, False, True, False, False, False]
+    # unquoted non-numeric values are converted value by value
+    data, null_mask, sd_mask = data_processing.parse_numeric_data(
+        '1 - 2', null_values, sd_values, decimals=0)
+    assert data[0] == 1.0 and isnan(data[1]) and data[2] == 2.0
+    assert not null_mask.any() and not sd_mask.any()
+    # unquoted inf and nan are values, not null or sd markers
+    data, null_mask, sd_mask = data_processing.parse_numeric_data(
+        '1 inf -inf nan ".." 2', null_values, sd_values)
+    assert list(data[[0, 1, 2, 5]]) == [1.0, float('inf'), float('-inf'), 2.0]
+    assert isnan(data[3]) and isnan(data[4])
+    assert not null_mask.any()
+    assert list(sd_mask) == [False, False, False, False, True, False]
+
+
+def test_metadata_tokenize():
+    """Should scan keyword, language, subkeys and values of each element."""
+    tokens = metadata_processing.metadata_tokenize(
+        'DECIMALS=1;\n VALUES[fr]("Sexe")="Hommes",\n"Femmes";'
+        'CELLNOTE("*","Total")="a; b=c";')
+    assert len(tokens) == 3
+    assert tokens[0] == ('DECIMALS', 'DECIMALS', None, (), '1')
+    assert tokens[1].name == 'VALUES[fr](Sexe)'
+    assert tokens[1].keyword == 'VALUES'
+    assert tokens[1].language == 'fr'
+    assert tokens[1].subkeys == ('Sexe',)
+    assert tokens[1].values == ['Hommes', 'Femmes']
+    assert tokens[2].subkeys == ('*', 'Total')
+    assert tokens[2].values == ['a; b=c']
+    with pytest.raises(ValueError):
+        metadata_processing.metadata_tokenize('TITLE "x";')
+
+
+def test_metadata_split_to_dict_tolerant():
+    """Odd names and quotation marks should be read as before the scanner."""
+    metadata = metadata_processing.metadata_split_to_dict(['KEY(a)b="x"'])
+    assert metadata == {'KEY(a)b': ['x']}
+    token = metadata_processing.metadata_token('KEY(a)b', '"x"')
+    assert token == ('KEY(a)b', 'KEY(a)b', None, (), ['x'])
+    assert metadata_processing.metadata_split_to_dict(
+        ['NOTE="unterminated']) == {'NOTE': []}
+    assert metadata_processing.metadata_split_to_dict(
+        ['NOTE="x";y"']) == {'NOTE': ['x']}
+    metadata_elements, _ = metadata_processing.metadata_extract(
+        'TITLE="t";NOTE="x";y";UNITS="u";DATA=1;')
+    assert metadata_elements == ['TITLE="t"', 'NOTE="x"']
+    assert len(metadata_elements.tokens) == 2
+
+
+def test_parse_metadata():
+    """Should return the same metadata as parse(), without DATA."""
+    parsed_pcaxis = pyaxis.parse(
+        data_path + 'px-x-0602000000_107.px',
+        encoding='ISO-8859-2',
+        lang='fr')
+    metadata_pcaxis = pyaxis.parse_metadata(
+        data_path + 'px-x-0602000000_107.px',
+        encoding='ISO-8859-2',
+        lang='fr',
+        chunk_size=1024)
+    assert 'DATA' not in metadata_pcaxis
+    assert metadata_pcaxis['METADATA'] == parsed_pcaxis['METADATA']
+    assert metadata_pcaxis['TRANSLATION'] == parsed_pcaxis['TRANSLATION']
+
+
+def test_selection_offsets():
+    """Offsets should point to the selected cells in row-major order."""
+    offsets, members = data_processing.selection_offsets(
+        ['a', 'b', 'c'], [['a1', 'a2'], ['b1', 'b2', 'b3'], ['c1', 'c2']],
+        {'b': ['b3', 'b1'], 'c': 'c2'})
+    assert list(offsets) == [1, 5, 7, 11]
+    assert members == [['a1', 'a2'], ['b1', 'b3'], ['c2']]
+    with pytest.raises(ValueError):
+        data_processing.selection_offsets(['a'], [['a1']], {'a': ['a9']})
+
+
+def test_parse_select():
+    """A selection should match the same rows of the whole dataframe."""
+    parsed_pcaxis = pyaxis.parse(
+        data_path + '14001.px',
+        encoding='ISO-8859-15',
+        numeric=True)
+    select = {'sexo': 'Esposas',
+              'Comunidad Autónoma de residencia del matrimonio': ['Cantabria', 'Total']}
+    selected_pcaxis = pyaxis.parse(
+        data_path + '14001.px',
+        encoding='ISO-8859-15',
+        numeric=True,
+        select=select)
+    d_f = parsed_pcaxis['DATA']
+    mask = d_f['sexo'].isin(['Esposas']) & \
+        d_f['Comunidad Autónoma de residencia del matrimonio'].isin(select[
+            'Comunidad Autónoma de residencia del matrimonio'])
+    expected = d_f[mask].reset_index(drop=True)
+    assert len(selected_pcaxis['DATA']) == 2 * 48 * 4
+    assert selected_pcaxis['DATA'].equals(expected)
+    assert list(selected_pcaxis['FLAGS']['NULL']) == \
+        list(parsed_pcaxis['FLAGS']['NULL'][mask.to_numpy()])
+
+
+def test_parse_many():
+    """Should parse every file and report errors per file."""
+    uris = [data_path + '14001.px', data_path + '1001.px', data_path + 'missing.px']
+    results = {uri: (parsed, error) for uri, parsed, error in pyaxis.parse_many(
+        uris, encoding='ISO-8859-15', max_workers=2, max_in_flight=2)}
+    assert len(results[uris[0]][0]['DATA']) == 8064
+    assert results[uris[1]][1] is None
+    assert results[uris[2]][0] is None
+    assert isinstance(results[uris[2]][1], FileNotFoundError)
+    processed = list(pyaxis.parse_many(
+        uris[:1], encoding='ISO-8859-15', executor='process', max_workers=1,
+        numeric=True))
+    assert processed[0][1]['DATA'].dtypes['DATA'] == 'float64'
+
+
+def test_import_side_effects():
+    """Importing pyaxis should neither load pandas or requests nor set up logging."""
+    statement = (
+        'import logging, sys; import pyaxis.pyaxis, pyaxis.json_stat, '
+        'pyaxis.indexing, pyaxis.arrow; '
+        'print(sorted({"pandas", "requests", "pyjstat"} & set(sys.modules)), '
+        'logging.getLogger().handlers)')
+    output = subprocess.run([sys.executable, '-c', statement], check=True,
+                            capture_output=True, text=True).stdout
+    assert output.strip() == '[] []'
+
+
+def test_metadata_key_index():
+    """Keys should be indexed by keyword, language and subkeys."""
+    index = metadata_processing.metadata_key_index({
+        'TITLE': ['Titel'],
+        'TITLE[fr]': ['Titre'],
+        'VALUES[fr](Niveau [1])': ['a'],
+        'CODES(Niveau [1])': ['1'],
+        'KEY(a)b': ['x']})
+    assert index['TITLE'] == ('TITLE', None, None)
+    assert index['TITLE[fr]'] == ('TITLE', 'fr', None)
+    assert index['VALUES[fr](Niveau [1])'] == ('VALUES', 'fr', 'Niveau [1]')
+    assert index['CODES(Niveau [1])'] == ('CODES', None, 'Niveau [1]')
+    assert index['KEY(a)b'] == ('KEY(a)b', None, None)
+
+
+def test_parse_languages():
+    """Every language should equal its own parse, sharing the DATA column."""
+    parsed = pyaxis.parse_languages(data_path + 'px-x-0602000000_107.px',
+                                    encoding='ISO-8859-2', numeric=True)
+    languages = parsed['de']['METADATA']['LANGUAGES']
+    assert list(parsed) == languages == ['de', 'fr', 'it', 'en']
+    for lang in languages:
+        parsed_pcaxis = pyaxis.parse(data_path + 'px-x-0602000000_107.px',
+                                     encoding='ISO-8859-2', lang=lang,
+                                     categorical=True, numeric=True)
+        assert parsed[lang]['METADATA'] == parsed_pcaxis['METADATA']
+        assert parsed[lang]['TRANSLATION'] == parsed_pcaxis['TRANSLATION']
+        assert parsed[lang]['DATA'].equals(parsed_pcaxis['DATA'])
+    assert shares_memory(parsed['fr']['DATA']['DATA'].values,
+                         parsed['de']['DATA']['DATA'].values)
+    assert list(parsed['de']['DATA'].columns)[0] == 'Wirtschaftsabteilung'
+
+    monolingual = pyaxis.parse_languages(data_path + '14001.px', encoding='ISO-8859-15')
+    assert list(monolingual) == [None]
+
+
+def test_relabel_dimension_columns():
+    """Members mapped to the same label should share a category."""
+    d_f = data_processing.build_dataframe(
+        ['sex', 'year'], [['men', 'women', 'total'], ['2020', '2021']],
+        Series(['1', '2', '3', '4', '5', '6']), r'^"\."$', r'"\.\."',
+        categorical=True)
+    relabelled = data_processing.relabel_dimension_columns(
+        d_f, ['sex', 'year'], [['men', 'women', 'total'], ['2020', '2021']],
+        ['sexe', 'année'], [['hommes', 'total', 'total'], ['2020', '2021']])
+    assert list(relabelled.columns) == ['sexe', 'année', 'DATA']
+    assert list(relabelled['sexe'].cat.categories) == ['hommes', 'total']
+    assert relabelled['sexe'].tolist() == ['hommes', 'hommes', 'total', 'total',
+                                           'total', 'total']
+    assert list(d_f.columns) == ['sex', 'year', 'DATA']
+
+
+def test_parse_dimensions_codes():
+    """Dimension columns should hold CODES, with lookup tables per language."""
+    parsed_pcaxis = pyaxis.parse(data_path + 'px-x-0602000000_107.px',
+                                 encoding='ISO-8859-2', lang='fr', dimensions='codes')
+    labelled_pcaxis = pyaxis.parse(data_path + 'px-x-0602000000_107.px',
+                                   encoding='ISO-8859-2', lang='fr')
+    d_f = parsed_pcaxis['DATA']
+    lookup = parsed_pcaxis['LOOKUP']['Division économique']
+    assert d_f['Division économique'].dtype == 'category'
+    assert d_f['Division économique'].iloc[0] == lookup['CODE'].iloc[0]
+    labels = lookup.set_index('CODE')['LABEL']
+    assert labels[d_f['Division économique']].tolist() == \
+        labelled_pcaxis['DATA']['Division économique'].tolist()
+    assert list(lookup.columns) == ['CODE', 'LABEL', 'LABEL[de]', 'LABEL[fr]',
+                                    'LABEL[it]', 'LABEL[en]']
+    assert lookup['LABEL'].tolist() == lookup['LABEL[fr]'].tolist()
+
+
+def test_parse_dimensions_index():
+    """Dimension columns should hold positions in VALUES, also with select."""
+    parsed_pcaxis = pyaxis.parse(data_path + '14001.px', encoding='ISO-8859-15',
+                                 dimensions='index',
+                                 select={'sexo': 'Esposas',
+                                         'edad de los cónyuges': 'Todas las edades'})
+    d_f = parsed_pcaxis['DATA']
+    assert d_f['sexo'].dtype == 'uint8'
+    assert set(d_f['sexo']) == {1}
+    assert set(d_f['edad de los cónyuges']) == {0}
+    assert parsed_pcaxis['LOOKUP']['sexo']['LABEL'][1] == 'Esposas'
+    assert list(parsed_pcaxis['LOOKUP']['sexo'].columns) == ['CODE', 'LABEL']
+    with pytest.raises(ValueError):
+        pyaxis.parse(data_path + '14001.px', encoding='ISO-8859-15',
+                     dimensions='numbers')
+
+
 if __name__ == '__main__':
     pytest.main()
@@ -15,6 +15,11 @@ setup(
     install_requires=[
         'numpy', 'requests', 'pandas', 'pyjstat'
     ],
+    extras_require={
+        'aio': ['aiohttp'],
+        'arrow': ['pyarrow'],
+        'xarray': ['xarray'],
+    },
     test_suite='pyaxis.test',
     keywords=['pcaxis', 'json-stat', 'statistics', 'dataframe', 'converter'],
     classifiers=[